@@ -73,6 +73,8 @@ class GameState:
 
     # static variable keeps track of which states have had getLegalActions called
     explored = set()
+    # the explored set is only read by the autograder; set to False to skip it
+    trackExplored = True
     def getAndResetExplored():
         tmp = GameState.explored.copy()
         GameState.explored = set()
@@ -98,8 +100,10 @@ class GameState:
         # Check that successors exist
         if self.isWin() or self.isLose(): raise Exception('Can\'t generate a successor of a terminal state.')
 
-        # Copy current state
-        state = GameState(self)
+        # Copy current state, sharing the agent states and capsules until the
+        # rules below change them
+        state = GameState()
+        state.data = self.data.shareCopy()
 
         # Let agent's logic deal with its action's effects on the board
         if agentIndex == 0:  # Pacman is moving
@@ -112,7 +116,7 @@ class GameState:
         if agentIndex == 0:
             state.data.scoreChange += -TIME_PENALTY # Penalty for waiting around
         else:
-            GhostRules.decrementTimer( state.data.agentStates[agentIndex] )
+            GhostRules.decrementTimer( state.data.ownAgentState(agentIndex) )
 
         # Resolve multi-agent effects
         GhostRules.checkDeath( state, agentIndex )
@@ -120,8 +124,9 @@ class GameState:
         # Book keeping
         state.data._agentMoved = agentIndex
         state.data.score += state.data.scoreChange
-        GameState.explored.add(self)
-        GameState.explored.add(state)
+        if GameState.trackExplored:
+            GameState.explored.add(self)
+            GameState.explored.add(state)
         return state
 
     def getLegalPacmanActions( self ):
@@ -342,7 +347,7 @@ class PacmanRules:
         if action not in legal:
             raise Exception("Illegal action " + str(action))
 
-        pacmanState = state.data.agentStates[0]
+        pacmanState = state.data.ownAgentState(0)
 
         # Update Configuration
         vector = Actions.directionToVector( action, PacmanRules.PACMAN_SPEED )
@@ -371,11 +376,11 @@ class PacmanRules:
                 state.data._win = True
         # Eat capsule
         if( position in state.getCapsules() ):
-            state.data.capsules.remove( position )
+            state.data.ownCapsules().remove( position )
             state.data._capsuleEaten = position
             # Reset all ghosts' scared timers
             for index in range( 1, len( state.data.agentStates ) ):
-                state.data.agentStates[index].scaredTimer = SCARED_TIME
+                state.data.ownAgentState(index).scaredTimer = SCARED_TIME
     consume = staticmethod( consume )
 
 class GhostRules:
@@ -404,7 +409,7 @@ class GhostRules:
         if action not in legal:
             raise Exception("Illegal ghost action " + str(action))
 
-        ghostState = state.data.agentStates[ghostIndex]
+        ghostState = state.data.ownAgentState(ghostIndex)
         speed = GhostRules.GHOST_SPEED
         if ghostState.scaredTimer > 0: speed /= 2.0
         vector = Actions.directionToVector( action, speed )
@@ -435,10 +440,12 @@ class GhostRules:
 
     def collide( state, ghostState, agentIndex):
         if ghostState.scaredTimer > 0:
+            ghostState = state.data.ownAgentState(agentIndex)
             state.data.scoreChange += 200
             GhostRules.placeGhost(state, ghostState)
             ghostState.scaredTimer = 0
             # Added for first-person
+            state.data._eaten = state.data._eaten[:]
             state.data._eaten[agentIndex] = True
         else:
             if not state.data._win:
@@ -523,6 +530,8 @@ def readCommand( argv ):
                       help='Turns on exception handling and timeouts during games', default=False)
     parser.add_option('--timeout', dest='timeout', type='int',
                       help=default('Maximum length of time an agent can spend computing in a single game'), default=30)
+    parser.add_option('--parallel', dest='parallel', type='int',
+                      help=default('Number of processes that play the games after training, without graphics'), default=1)
 
     options, otherjunk = parser.parse_args(argv)
     if len(otherjunk) != 0:
@@ -570,6 +579,7 @@ def readCommand( argv ):
     args['record'] = options.record
     args['catchExceptions'] = options.catchExceptions
     args['timeout'] = options.timeout
+    args['parallel'] = options.parallel
 
     # Special case: recorded games don't use the runGames method or args structure
     if options.gameToReplay != None:
@@ -625,7 +635,61 @@ def replayGame( layout, actions, display ):
 
     display.finish()
 
-def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0, catchExceptions=False, timeout=30 ):
+def recordGame( layout, game, index ):
+    import time, cPickle
+    fname = ('recorded-game-%d' % (index + 1)) +  '-'.join([str(t) for t in time.localtime()[1:6]])
+    f = file(fname, 'w')
+    components = {'layout': layout, 'actions': game.moveHistory}
+    cPickle.dump(components, f)
+    f.close()
+
+def initParallelWorker( *gameArgs ):
+    global parallelGameArgs
+    parallelGameArgs = gameArgs
+
+def playParallelGame( task ):
+    """
+    Plays one game without graphics in a worker process started by
+    runParallelGames, and returns its final state and move history.
+    """
+    index, seed = task
+    layout, pacman, ghosts, record, catchExceptions, timeout = parallelGameArgs
+    random.seed( seed )
+    import textDisplay
+    rules = ClassicGameRules(timeout)
+    game = rules.newGame( layout, pacman, ghosts, textDisplay.NullGraphics(), False, catchExceptions)
+    game.run()
+    if record: recordGame( layout, game, index )
+    return game.state, game.moveHistory
+
+def runParallelGames( layout, pacman, ghosts, indices, record, catchExceptions, timeout, parallel ):
+    """
+    Plays the games numbered indices on a pool of parallel worker processes,
+    each game with its own random seed drawn from this process.  The workers
+    are forked from this process, so they play with the agents exactly as they
+    are now (e.g. after training) and the agents need not be picklable.
+    """
+    import multiprocessing, textDisplay
+    tasks = [(i, random.randint(0, sys.maxint)) for i in indices]
+    pool = multiprocessing.Pool( parallel, initParallelWorker, (layout, pacman, ghosts, record, catchExceptions, timeout) )
+    try:
+        results = pool.map( playParallelGame, tasks )
+    finally:
+        pool.close()
+        pool.join()
+
+    # Rebuild finished Game objects so callers see the same result as from runGames
+    rules = ClassicGameRules(timeout)
+    games = []
+    for state, moveHistory in results:
+        game = Game( [pacman] + ghosts[:layout.getNumGhosts()], textDisplay.NullGraphics(), rules, catchExceptions=catchExceptions )
+        game.state = state
+        game.moveHistory = moveHistory
+        game.gameOver = True
+        games.append(game)
+    return games
+
+def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0, catchExceptions=False, timeout=30, parallel=1 ):
     import __main__
     __main__.__dict__['_display'] = display
 
@@ -634,6 +698,10 @@ def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0
 
     for i in range( numGames ):
         beQuiet = i < numTraining
+        if not beQuiet and parallel > 1:
+            # Training is over: the remaining games do not affect each other
+            games += runParallelGames( layout, pacman, ghosts, range(i, numGames), record, catchExceptions, timeout, parallel )
+            break
         if beQuiet:
                 # Suppress output and graphics
             import textDisplay
@@ -646,13 +714,7 @@ def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0
         game.run()
         if not beQuiet: games.append(game)
 
-        if record:
-            import time, cPickle
-            fname = ('recorded-game-%d' % (i + 1)) +  '-'.join([str(t) for t in time.localtime()[1:6]])
-            f = file(fname, 'w')
-            components = {'layout': layout, 'actions': game.moveHistory}
-            cPickle.dump(components, f)
-            f.close()
+        if record: recordGame( layout, game, i )
 
     if (numGames-numTraining) > 0:
         scores = [game.state.getScore() for game in games]
@@ -677,6 +739,7 @@ if __name__ == '__main__':
     > python pacman.py --help
     """
     args = readCommand( sys.argv[1:] ) # Get game components based on input
+    GameState.trackExplored = False # Only the autograder looks at GameState.explored
     runGames( **args )
 
     # import cProfile
@@ -80,104 +80,78 @@ def tinyMazeSearch(problem):
 
 
 
-# Each node is in the form of (state, path, cost)
+# Each node is in the form of (state, parent, action, cost).  Nodes only point
+# back at their parent, so the plan is rebuilt once a goal has been popped
+# instead of copying the whole action list into every fringe entry.
 
-def breadthFirstSearch(problem):
-
-    visited = []
-    fringe = util.Queue()
-
-    start_node = (problem.getStartState(), [], 0)
-    fringe.push(start_node)
+def nodePath(node):
+    """
+    Follows the parent pointers of a search node back to the start node and
+    returns the list of actions that leads to it.
+    """
+    path = []
+    while node[1] is not None:
+        path.append(node[2])
+        node = node[1]
+    path.reverse()
+    return path
 
-    while 1:
 
-        if fringe.isEmpty():
-            break
+def graphSearch(problem, fringe, priority=None):
+    """
+    Generic graph search shared by bfs, dfs, ucs and astar; the fringe decides
+    the expansion order.  States are goal-tested when popped and expanded at
+    most once, using a hashed closed set.
 
-        state, path, cost = fringe.pop()
+    With a priority function the fringe must be a util.PriorityQueue.  It then
+    holds states rather than nodes, and a cheaper path to a queued state
+    lowers its priority with fringe.update instead of adding a stale entry.
+    """
+    closed = set()
+    start = (problem.getStartState(), None, None, 0)
+    if priority is None:
+        fringe.push(start)
+    else:
+        queued = {start[0]: start}  # state -> best node found for it so far
+        fringe.push(start[0], priority(start))
+
+    while not fringe.isEmpty():
+
+        if priority is None:
+            node = fringe.pop()
+        else:
+            node = queued.pop(fringe.pop())
+        state, cost = node[0], node[3]
 
         if problem.isGoalState(state):
-            return path
+            return nodePath(node)
 
-        if state not in visited:
-            visited.append(state)
+        if state not in closed:
+            closed.add(state)
 
             for succ_state, succ_action, succ_cost in problem.getSuccessors(state):
-                new_state = succ_state
-                new_cost = cost + succ_cost
-                new_path = path + [succ_action]
-                new_node = (new_state, new_path, new_cost)
-                fringe.push(new_node)
+                # A closed state would be skipped when popped anyway
+                if succ_state in closed:
+                    continue
+                succ_node = (succ_state, node, succ_action, cost + succ_cost)
+                if priority is None:
+                    fringe.push(succ_node)
+                elif fringe.update(succ_state, priority(succ_node)):
+                    queued[succ_state] = succ_node
 
     return False
 
 
+def breadthFirstSearch(problem):
+    return graphSearch(problem, util.Queue())
 
-def depthFirstSearch(problem):
-
-
-    visited = []
-    fringe = util.Stack()
-
-    start_node = (problem.getStartState(), [], 0)
-    fringe.push(start_node)
-
-    while 1:
-
-        if fringe.isEmpty():
-            break
-
-        state, path, cost = fringe.pop()
-
-        if problem.isGoalState(state):
-            return path
-
-        if state not in visited:
-            visited.append(state)
-
-            for succ_state, succ_action, succ_cost in problem.getSuccessors(state):
-                new_state = succ_state
-                new_cost = cost + succ_cost
-                new_path = path + [succ_action]
-                new_node = (new_state, new_path, new_cost)
-                fringe.push(new_node)
-
-    return False
 
+def depthFirstSearch(problem):
+    return graphSearch(problem, util.Stack())
 
 
 def uniformCostSearch(problem):
-
-    visited = []
-    fringe = util.PriorityQueue()
-
-    start_node = (problem.getStartState(), [], 0)
-    fringe.push(start_node, 0)
-
-    while 1:
-
-        if fringe.isEmpty():
-            break
-
-        state, path, cost = fringe.pop()
-
-        if problem.isGoalState(state):
-            return path
-
-        if state not in visited:
-            visited.append(state)
-
-            for succ_state, succ_action, succ_cost in problem.getSuccessors(state):
-                new_state = succ_state
-                new_cost = cost + succ_cost
-                new_path = path + [succ_action]
-                new_node = (new_state, new_path, new_cost)
-                fringe.push(new_node, new_cost)
-
-    return False
-
-
+    return graphSearch(problem, util.PriorityQueue(), lambda node: node[3])
 
 
 def nullHeuristic(state, problem = None):
@@ -192,33 +166,10 @@ def aStarSearch(problem, heuristic = nullHeuristic):
 
     # function heuristic(position, problem, info = {})
 
-    visited = []
-    fringe = util.PriorityQueue()
-
-    start_node = (problem.getStartState(), [], 0)
-    fringe.push(start_node, 0)
-
-    while 1:
+    def priority(node):
+        return node[3] + heuristic(node[0], problem)
 
-        if fringe.isEmpty():
-            break
-
-        state, path, cost = fringe.pop()
-
-        if problem.isGoalState(state):
-            return path
-
-        if state not in visited:
-            visited.append(state)
-
-            for succ_state, succ_action, succ_cost in problem.getSuccessors(state):
-                new_state = succ_state
-                new_cost = cost + succ_cost
-                new_path = path + [succ_action]
-                new_node = (new_state, new_path, new_cost)
-                fringe.push(new_node, new_cost + heuristic(new_node[0], problem))
-
-    return False
+    return graphSearch(problem, util.PriorityQueue(), priority)
 
 
 
@@ -38,6 +38,7 @@ from game import Directions
 from game import Agent
 from game import Actions
 import util
+import distanceCalculator
 import time
 import search
 
@@ -467,8 +468,9 @@ class FoodSearchProblem:
 
 def mazeDistance(point1, point2, gameState):
     """
-    Returns the maze distance between any two points, using the search functions
-    you have already built. The gameState can be any game state -- Pacman's
+    Returns the maze distance between any two points, looked up in the
+    all-pairs distance table of the maze (see distanceCalculator.py), which is
+    computed once per layout. The gameState can be any game state -- Pacman's
     position in that state is ignored.
 
     Example usage: mazeDistance( (2,4), (5,6), gameState)
@@ -480,5 +482,4 @@ def mazeDistance(point1, point2, gameState):
     walls = gameState.getWalls()
     assert not walls[x1][y1], 'point1 is a wall: ' + str(point1)
     assert not walls[x2][y2], 'point2 is a wall: ' + str(point2)
-    prob = PositionSearchProblem(gameState, start=point1, goal=point2, warn=False, visualize=False)
-    return len(search.bfs(prob))
+    return distanceCalculator.getMazeDistances(walls).getDistance(point1, point2)
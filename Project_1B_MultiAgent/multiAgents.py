@@ -14,7 +14,7 @@
 
 from util import manhattanDistance
 from game import Directions
-import random, util
+import random, util, time
 
 from game import Agent
 
@@ -86,6 +86,16 @@ def scoreEvaluationFunction(currentGameState):
     """
     return currentGameState.getScore()
 
+def evaluateStates(evaluationFunction, gameStates):
+    """
+      Scores a list of states with evaluationFunction, all at once through
+      evaluationFunction.batch if it has one and one state at a time if not.
+    """
+    batch = getattr(evaluationFunction, 'batch', None)
+    if batch is not None:
+        return batch(gameStates)
+    return [evaluationFunction(gameState) for gameState in gameStates]
+
 class MultiAgentSearchAgent(Agent):
     """
       This class provides some common elements to all of your
@@ -106,6 +116,47 @@ class MultiAgentSearchAgent(Agent):
         self.evaluationFunction = util.lookup(evalFn, globals())
         self.depth = int(depth)
 
+    def lastPlyValue(self, currentState, agentIndex):
+        """
+          Value of currentState on the last ply, with agentIndex to move.  The
+          rest of the ply is expanded first so that all of its leaves can be
+          scored in one call to evaluateStates.
+        """
+        leaves = []
+        tree = self.expandPly(currentState, agentIndex, leaves)
+        return self.foldPly(tree, evaluateStates(self.evaluationFunction, leaves))
+
+    def expandPly(self, currentState, agentIndex, leaves):
+        """
+          Appends the leaves below currentState to leaves and returns the
+          shape of the subtree: a leaf's index into leaves, or a pair of the
+          agent to move and the subtrees of its actions.
+        """
+        if agentIndex == currentState.getNumAgents() or currentState.isWin() or currentState.isLose():
+            leaves.append(currentState)
+            return len(leaves) - 1
+        legalActions = currentState.getLegalActions(agentIndex)
+        return (agentIndex, [self.expandPly(currentState.generateSuccessor(agentIndex, action), agentIndex + 1, leaves)
+                             for action in legalActions])
+
+    def foldPly(self, tree, leafValues):
+        if type(tree) is int:
+            return leafValues[tree]
+        agentIndex, subtrees = tree
+        values = [self.foldPly(subtree, leafValues) for subtree in subtrees]
+        if agentIndex == 0:
+            v = float("-inf")
+            for value in values:
+                v = max(v, value)
+            return v
+        return self.ghostValue(values)
+
+    def ghostValue(self, values):
+        """
+          How a ghost node combines the values of its successors.
+        """
+        util.raiseNotDefined()
+
 class MinimaxAgent(MultiAgentSearchAgent):
     """
       Your minimax agent (question 1)
@@ -155,6 +206,9 @@ class MinimaxAgent(MultiAgentSearchAgent):
         # If it is terminal state, return utility of the state
         if currentDepth == self.depth or currentState.isWin() or currentState.isLose():
             return self.evaluationFunction(currentState)
+        # On the last ply, score all the leaves together
+        if currentDepth == self.depth - 1:
+            return self.lastPlyValue(currentState, agentIndex)
         # If it is pacman (max agent), return max-value
         if agentIndex == 0:
             return self.maxValue(currentState, agentIndex, currentDepth)
@@ -188,6 +242,13 @@ class MinimaxAgent(MultiAgentSearchAgent):
             v = min(v, self.value(successor, nextAgent, nextDepth))
         return v
 
+    def ghostValue(self, values):
+        v = float("+inf")
+        for value in values:
+            v = min(v, value)
+        return v
+
+
 
 
 
@@ -196,18 +257,83 @@ class MinimaxAgent(MultiAgentSearchAgent):
 
 
 
+# Kinds of values kept in a TranspositionTable entry
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+# Remaining depth recorded for subtrees searched down to win/lose states only
+EXHAUSTIVE = float("inf")
+
+# Share of the per-move time limit spent searching; the rest is slack for
+# the game's own timing of the move
+TIME_BUDGET_FRACTION = 0.8
+
+class SearchTimeout(Exception):
+    """
+      Raised inside an iterative-deepening search when the time budget of the
+      move runs out.  The iteration in progress is then thrown away.
+    """
+    pass
+
+class TranspositionTable:
+    """
+      A fixed-size table of searched positions.  An entry lives in slot
+      key % size; it is replaced by a search of at least the same depth, or
+      by any search once it is left over from an earlier move.
+
+      Entries are tuples (key, depth, value, flag, bestAction, generation).
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.slots = [None] * size
+        self.generation = 0
+
+    def newSearch(self):
+        self.generation += 1
+
+    def lookup(self, key):
+        entry = self.slots[key % self.size]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key, depth, value, flag, bestAction):
+        slot = key % self.size
+        entry = self.slots[slot]
+        if entry is None or entry[5] != self.generation or depth >= entry[1]:
+            self.slots[slot] = (key, depth, value, flag, bestAction, self.generation)
 
 class AlphaBetaAgent(MultiAgentSearchAgent):
     """
       Your minimax agent with alpha-beta pruning (question 2)
+
+      With iterative=True the agent instead deepens one ply at a time up to
+      self.depth, remembering searched positions in a transposition table of
+      tableSize entries and trying the best move found so far first.  A
+      timeLimit (seconds per move) keeps deepening until the time runs out;
+      pass timeLimit=timeout to use the game's move timeout.
     """
 
+    def __init__(self, evalFn = 'scoreEvaluationFunction', depth = '2',
+                 iterative = 'False', timeLimit = '0', tableSize = '65536'):
+        MultiAgentSearchAgent.__init__(self, evalFn, depth)
+        self.timeLimit = float(timeLimit)
+        self.iterative = str(iterative) == 'True' or self.timeLimit > 0
+        self.table = None
+        if self.iterative:
+            self.table = TranspositionTable(int(tableSize))
+
     def getAction(self, currentState):
         """
           Returns the minimax action using self.depth and self.evaluationFunction
         """
         "*** YOUR CODE HERE ***"
 
+        if self.iterative:
+            return self.iterativeDeepeningAction(currentState)
+
         # Get all the legal actions and their values
         legalActions = currentState.getLegalActions(self.index)
         alpha = float("-inf")
@@ -271,6 +397,131 @@ class AlphaBetaAgent(MultiAgentSearchAgent):
             beta = min(beta, v)
         return v
 
+    def iterativeDeepeningAction(self, currentState):
+        """
+          Searches to depth 1, 2, ... and returns the action of the deepest
+          search that finished.  Each search tries the root actions in the
+          order of the previous one's values.
+        """
+        self.table.newSearch()
+        self.deadline = None
+        start = time.time()
+        orderedActions = currentState.getLegalActions(self.index)
+        bestAction = orderedActions[0]
+        depthLimit = 1
+        while self.timeLimit > 0 or depthLimit <= self.depth:
+            # The first search always completes so that there is a move to make
+            if self.timeLimit > 0 and depthLimit > 1:
+                self.deadline = start + self.timeLimit * TIME_BUDGET_FRACTION
+            self.depthCutoff = False
+            try:
+                values = self.rootValues(currentState, orderedActions, depthLimit)
+            except SearchTimeout:
+                break
+            order = sorted(range(len(orderedActions)), key=lambda i: -values[i])
+            orderedActions = [orderedActions[i] for i in order]
+            bestAction = orderedActions[0]
+            # Every line ended in a win or loss, so searching deeper changes nothing
+            if not self.depthCutoff:
+                break
+            depthLimit += 1
+        return bestAction
+
+    def rootValues(self, currentState, orderedActions, depthLimit):
+        """
+          Values of the root actions in a depth-limited search.  Only the best
+          is exact; the rest are upper bounds.
+        """
+        alpha = float("-inf")
+        beta = float("+inf")
+        values = []
+        for action in orderedActions:
+            v = self.boundedValue(currentState.generateSuccessor(self.index, action),
+                                  self.index + 1, 0, depthLimit, alpha, beta)
+            values.append(v)
+            alpha = max(alpha, v)
+        return values
+
+    def boundedValue(self, currentState, agentIndex, currentDepth, depthLimit, alpha, beta):
+        """
+          Alpha-beta value of currentState, looked up in and stored to the
+          transposition table.
+        """
+        if currentState.isWin() or currentState.isLose():
+            return self.evaluationFunction(currentState)
+        if currentDepth == depthLimit:
+            self.depthCutoff = True
+            return self.evaluationFunction(currentState)
+        if self.deadline is not None and time.time() > self.deadline:
+            raise SearchTimeout()
+
+        remainingDepth = depthLimit - currentDepth
+        key = self.stateKey(currentState, agentIndex)
+        entry = self.table.lookup(key)
+        legalActions = currentState.getLegalActions(agentIndex)
+        if entry is not None:
+            storedDepth, storedValue, flag, storedAction = entry[1:5]
+            if storedDepth >= remainingDepth and (flag == EXACT or
+                    flag == LOWER_BOUND and storedValue > beta or
+                    flag == UPPER_BOUND and storedValue < alpha):
+                if storedDepth != EXHAUSTIVE:
+                    self.depthCutoff = True
+                return storedValue
+            # Try the best action of the last search of this state first
+            if storedAction in legalActions:
+                legalActions.remove(storedAction)
+                legalActions.insert(0, storedAction)
+
+        lastGhostAgent = currentState.getNumAgents() - 1
+        nextAgent = agentIndex + 1 if agentIndex != lastGhostAgent else 0
+        nextDepth = currentDepth + 1 if agentIndex == lastGhostAgent else currentDepth
+        outerCutoff = self.depthCutoff
+        self.depthCutoff = False
+        originalAlpha, originalBeta = alpha, beta
+        bestAction = None
+        if agentIndex == 0:
+            v = float("-inf")
+            for action in legalActions:
+                successorValue = self.boundedValue(currentState.generateSuccessor(agentIndex, action),
+                                                   nextAgent, nextDepth, depthLimit, alpha, beta)
+                if successorValue > v:
+                    v, bestAction = successorValue, action
+                if v > beta:
+                    break
+                alpha = max(alpha, v)
+        else:
+            v = float("+inf")
+            for action in legalActions:
+                successorValue = self.boundedValue(currentState.generateSuccessor(agentIndex, action),
+                                                   nextAgent, nextDepth, depthLimit, alpha, beta)
+                if successorValue < v:
+                    v, bestAction = successorValue, action
+                if v < alpha:
+                    break
+                beta = min(beta, v)
+
+        if v <= originalAlpha:
+            flag = UPPER_BOUND
+        elif v >= originalBeta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        storedDepth = remainingDepth if self.depthCutoff else EXHAUSTIVE
+        self.table.store(key, storedDepth, v, flag, bestAction)
+        self.depthCutoff = self.depthCutoff or outerCutoff
+        return v
+
+    def stateKey(self, currentState, agentIndex):
+        """
+          A compact hash of everything the search and evaluation can see:
+          whose turn it is, agent positions, directions and scared timers,
+          food, capsules and score.
+        """
+        data = currentState.data
+        agents = tuple((s.configuration.pos, s.configuration.direction, s.scaredTimer)
+                       for s in data.agentStates)
+        return hash((agentIndex, agents, data.food, tuple(data.capsules), data.score))
+
 
 class ExpectimaxAgent(MultiAgentSearchAgent):
     """
@@ -302,6 +553,9 @@ class ExpectimaxAgent(MultiAgentSearchAgent):
         # If it is terminal state, return utility of the state
         if currentDepth == self.depth or currentState.isWin() or currentState.isLose():
             return self.evaluationFunction(currentState)
+        # On the last ply, score all the leaves together
+        if currentDepth == self.depth - 1:
+            return self.lastPlyValue(currentState, agentIndex)
         # If it is pacman (max agent), return max-value
         if agentIndex == 0:
             return self.maxValue(currentState, agentIndex, currentDepth)
@@ -332,6 +586,13 @@ class ExpectimaxAgent(MultiAgentSearchAgent):
         v /= len(legalActions)
         return v
 
+    def ghostValue(self, values):
+        v = 0.0
+        for value in values:
+            v += value
+        v /= len(values)
+        return v
+
 
 
 def betterEvaluationFunction(currentGameState):
@@ -404,11 +665,52 @@ def betterEvaluationFunction(currentGameState):
 
     return score
 
+def betterEvaluationBatch(gameStates):
+    """
+      betterEvaluationFunction over a list of states, giving the same values.
 
-
-
-
-
+      Pacman moves once per ply, so the leaves of a ply share a handful of
+      Pacman positions and food grids.  The food and capsule terms, which
+      depend on nothing else, are worked out once for each; only the ghost
+      terms are computed for every state.
+    """
+    foodTerms = {}
+    capsuleTerms = {}
+    values = []
+    for gameState in gameStates:
+        data = gameState.data
+        position = data.agentStates[0].getPosition()
+
+        foodKey = (position, data.food)
+        if foodKey not in foodTerms:
+            foods = data.food
+            closestFood = min([manhattanDistance(position, food) for food in foods]) if foods else 0
+            foodTerms[foodKey] = (closestFood, foods.count())
+        closestFood, numOfFoods = foodTerms[foodKey]
+        score = data.score
+        score -= 2*closestFood
+        score -= 5*numOfFoods
+
+        scaredGhost = False
+        for ghost in data.agentStates[1:]:
+            if ghost.scaredTimer == 0:
+                score -= 12*manhattanDistance(position, ghost.getPosition())
+            else:
+                score += manhattanDistance(position, ghost.getPosition())
+                scaredGhost = True
+
+        if not scaredGhost:
+            capsules = data.capsules
+            capsuleKey = (position, tuple(capsules))
+            if capsuleKey not in capsuleTerms:
+                closestCapsule = min([manhattanDistance(position, capsule) for capsule in capsules]) if capsules else 0
+                capsuleTerms[capsuleKey] = len(capsules) + closestCapsule
+            score -= .65*capsuleTerms[capsuleKey]
+
+        values.append(score)
+    return values
+
+betterEvaluationFunction.batch = betterEvaluationBatch
 
 # Abbreviation
 better = betterEvaluationFunction
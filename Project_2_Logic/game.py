@@ -274,6 +274,137 @@ class Grid:
                 bools.append(False)
         return bools
 
+class BitGrid(object):
+    """
+    A 2-dimensional array of booleans packed into a single Python int, where
+    cell (x,y) is bit number x * height + y.  It offers the same grid[x][y]
+    interface as Grid, but hashing, counting and copying work on the int.
+
+    The int is never changed in place: setting a cell stores a new int on
+    this grid only.  Copies can therefore share it, so copy() is O(1) and
+    changes to a copy are never seen by the original.
+    """
+    def __init__(self, width, height, initialValue=False, bitRepresentation=None):
+        if initialValue not in [False, True]: raise Exception('Grids can only contain booleans')
+
+        self.width = width
+        self.height = height
+        self.bits = 0
+        if initialValue:
+            self.bits = (1 << (width * height)) - 1
+        if bitRepresentation:
+            self.bits = BitGrid.fromGrid(Grid(width, height, bitRepresentation=bitRepresentation)).bits
+
+    def fromGrid(grid):
+        "Packs a Grid of booleans into a new BitGrid"
+        g = BitGrid(grid.width, grid.height)
+        bits, base = 0, 1
+        for column in grid.data:
+            for cell in column:
+                if cell:
+                    bits |= base
+                base <<= 1
+        g.bits = bits
+        return g
+    fromGrid = staticmethod(fromGrid)
+
+    def toGrid(self):
+        "Returns an equivalent list-of-lists Grid"
+        g = Grid(self.width, self.height)
+        g.data = self.data
+        return g
+
+    def __getitem__(self, x):
+        if x < 0: x += self.width
+        if not 0 <= x < self.width: raise IndexError('grid index out of range')
+        return BitGridColumn(self, x)
+
+    def __setitem__(self, x, column):
+        for y in range(self.height):
+            BitGridColumn(self, x)[y] = column[y]
+
+    def getData(self):
+        return [[bool(self.bits >> (x * self.height + y) & 1) for y in range(self.height)] for x in range(self.width)]
+    data = property(getData) # read-only list of lists, as in Grid
+
+    def __str__(self):
+        return str(self.toGrid())
+
+    def __eq__(self, other):
+        if other is None: return False
+        if isinstance(other, BitGrid):
+            return self.bits == other.bits and self.width == other.width and self.height == other.height
+        return self.data == other.data
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        # Equal to Grid.__hash__ for the same cells
+        return hash(self.bits)
+
+    def copy(self):
+        g = BitGrid(self.width, self.height)
+        g.bits = self.bits
+        return g
+
+    def deepCopy(self):
+        return self.copy()
+
+    def shallowCopy(self):
+        # Cells are never changed in place, so there is nothing to share
+        return self.copy()
+
+    def count(self, item =True ):
+        n = bin(self.bits).count('1')
+        if item: return n
+        return self.width * self.height - n
+
+    def asList(self, key = True):
+        bits = self.bits
+        if not key:
+            bits ^= (1 << (self.width * self.height)) - 1
+        list = []
+        while bits:
+            lowest = bits & -bits
+            index = lowest.bit_length() - 1
+            list.append( (index / self.height, index % self.height) )
+            bits ^= lowest
+        return list
+
+    def packBits(self):
+        return self.toGrid().packBits()
+
+class BitGridColumn(object):
+    """
+    The view of column x of a BitGrid returned by grid[x], so that grid[x][y]
+    reads and writes a single bit of the grid.
+    """
+    __slots__ = ('grid', 'x')
+
+    def __init__(self, grid, x):
+        self.grid = grid
+        self.x = x
+
+    def __getitem__(self, y):
+        grid = self.grid
+        if y < 0: y += grid.height
+        if not 0 <= y < grid.height: raise IndexError('grid index out of range')
+        return grid.bits >> (self.x * grid.height + y) & 1 == 1
+
+    def __setitem__(self, y, value):
+        grid = self.grid
+        if y < 0: y += grid.height
+        if not 0 <= y < grid.height: raise IndexError('grid index out of range')
+        bit = 1 << (self.x * grid.height + y)
+        if value:
+            grid.bits |= bit
+        else:
+            grid.bits &= ~bit
+
+    def __len__(self):
+        return self.grid.height
+
 def reconstituteGrid(bitRep):
     if type(bitRep) is not type((1,2)):
         return bitRep
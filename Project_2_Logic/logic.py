@@ -627,6 +627,104 @@ def pycoSAT(expr):
     
     return model
 
+class ClauseStore:
+    """A CNF knowledge base that only grows, kept as the integer clauses that
+    pycosat reads, so that solving it again after adding a few sentences does
+    not convert the older ones again.
+
+    Clauses can be added as CNF Exprs, or built directly as lists of integer
+    literals (see literal and the add* methods) without making any Exprs.
+    Both share one symbol table keyed by symbol name, numbered in order of
+    first appearance as in mapSymbolAndIndices.
+
+    >>> A, B = Expr('A'), Expr('B')
+    >>> kb = ClauseStore()
+    >>> kb.add(A | B)
+    >>> kb.addClause([-kb.literal('A')])
+    >>> sorted((str(k), v) for k, v in kb.solve().items())
+    [('A', False), ('B', True)]
+    >>> kb.solve([[-kb.literal('B')]])
+    False
+    """
+    def __init__(self):
+        self.symbol_indices = {}
+        self.symbol_names = [None]
+        self.clauses_int = []
+
+    def literal(self, sym_str, *index):
+        """Return the integer for the symbol PropSymbolExpr(sym_str, *index)
+        would name, numbering it if it is new. Negate it for the negative
+        literal.
+        """
+        if index:
+            sym_str = '%s[%s]' % (sym_str, ','.join(['%d' % i for i in index]))
+        idx = self.symbol_indices.get(sym_str)
+        if idx is None:
+            idx = len(self.symbol_names)
+            self.symbol_indices[sym_str] = idx
+            self.symbol_names.append(sym_str)
+        return idx
+
+    def add(self, cnf):
+        """Add the clauses of the CNF expression cnf to the store."""
+        assert is_valid_cnf(cnf), "{} is not in CNF.".format(cnf)
+        for clause in conjuncts(cnf):
+            # Number the symbols in the order mapSymbolAndIndices would
+            for symbol in prop_symbols(clause):
+                self.literal(symbol.op)
+            c_int = []
+            for lit in disjuncts(clause):
+                if len(lit.args) == 0:
+                    c_int.append(self.symbol_indices[lit.op])
+                else:
+                    c_int.append(-self.symbol_indices[lit.args[0].op])
+            self.clauses_int.append(c_int)
+
+    def addClause(self, literals):
+        """Add the disjunction of a list of integer literals."""
+        self.clauses_int.append(literals)
+
+    def addAtMostOne(self, literals):
+        """Add one clause (~a | ~b) for each pair of the integer literals."""
+        for i, a in enumerate(literals):
+            for b in literals[i + 1:]:
+                self.clauses_int.append([-a, -b])
+
+    def addExactlyOne(self, literals):
+        self.addClause(list(literals))
+        self.addAtMostOne(literals)
+
+    def addEquivalentToAny(self, literal, conjunctions):
+        """Add literal <=> (c1 | c2 | ...), where each ci is a list of integer
+        literals standing for their conjunction; successor state axioms have
+        this shape.
+        """
+        # literal is implied by each conjunction
+        for conjunction in conjunctions:
+            self.clauses_int.append([-l for l in conjunction] + [literal])
+        # and implies one of them: distribute | over & as to_cnf would
+        for choice in itertools.product(*conjunctions):
+            self.clauses_int.append([-literal] + list(choice))
+
+    def solve(self, assumptions=None):
+        """Return a model of the store, as pycoSAT does, or False if there is
+        none. assumptions is a list of integer clauses that hold for this call
+        only.
+        """
+        clauses_int = self.clauses_int
+        if assumptions:
+            clauses_int = clauses_int + assumptions
+
+        model_int = pycosat.solve(clauses_int)
+
+        if model_int == 'UNSAT' or model_int == 'UNKNOWN':
+            return False
+
+        model = {}
+        for lit_int in model_int:
+            model[Expr(self.symbol_names[abs(lit_int)])] = lit_int > 0
+        return model
+
 def mapSymbolAndIndices(clauses):
     """
     Create a dictionary that maps each clause to an integer index.
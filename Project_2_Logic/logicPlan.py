@@ -18,7 +18,6 @@ Pacman agents (in logicAgents.py).
 """
 
 import util
-import sys
 import logic
 import game
 
@@ -187,8 +186,8 @@ def atMostOne(literals) :
     "*** YOUR CODE HERE ***"
 
     conjoinList = []
-    for i in literals:
-        for j in [l for l in literals if l != i]:
+    for index, i in enumerate(literals):
+        for j in literals[index + 1:]:
             # Appended pair is true iff i and j are both true
             conjoinList.append(logic.disjoin(~i, ~j))
     # In any pair of the literals, two cannot be both true
@@ -261,6 +260,23 @@ def pacmanSuccessorStateAxioms(x, y, t, walls_grid):
 
     return pacmanNow % logic.disjoin(i for i in listPrev)
 
+def pacmanSuccessorStateClauses(KB, x, y, t, walls_grid):
+    """
+    Adds the clauses of pacmanSuccessorStateAxioms(x, y, t, walls_grid) to the
+    logic.ClauseStore KB, without building the Expr.
+    """
+    listPrev = []
+    directions = ["East", "West", "South", "North"]
+    at = [(x-1, y), (x+1, y), (x, y+1), (x, y-1)]
+    for i in xrange(len(directions)):
+        coord = at[i]
+        if not walls_grid[coord[0]][coord[1]]:
+            prevAtHere = KB.literal(pacman_str, coord[0], coord[1], t-1)
+            prevGoThere = KB.literal(directions[i], t-1)
+            listPrev.append([prevAtHere, prevGoThere])
+
+    KB.addEquivalentToAny(KB.literal(pacman_str, x, y, t), listPrev)
+
 
 def positionLogicPlan(problem):
     """
@@ -279,8 +295,12 @@ def positionLogicPlan(problem):
 
 
 
-    # Start position expr
-    KB = logic.PropSymbolExpr(pacman_str, start[0], start[1], 1)
+    # The KB only grows with t, so each step just adds its own clauses,
+    # built straight as integer clauses
+    KB = logic.ClauseStore()
+
+    # Start position
+    KB.addClause([KB.literal(pacman_str, start[0], start[1], 1)])
 
     t = 1
 
@@ -288,15 +308,12 @@ def positionLogicPlan(problem):
     for x in xrange(1, width + 1):
         for y in xrange(1, height + 1):
             if not walls[x][y] and (x, y) != start:
-                notStartHere = ~logic.PropSymbolExpr(pacman_str, x, y, 1)
-                KB = logic.conjoin(KB, notStartHere)
+                KB.addClause([-KB.literal(pacman_str, x, y, 1)])
 
     while t <= 50:
 
         # One and only one action at one time
-        currentActions = [logic.PropSymbolExpr(action, t) for action in actions]
-        onlyAction = exactlyOne(currentActions)
-        KB = logic.conjoin(KB, onlyAction)
+        KB.addExactlyOne([KB.literal(action, t) for action in actions])
 
 
 
@@ -307,18 +324,15 @@ def positionLogicPlan(problem):
                 # If no wall there
                 if not walls[x][y]:
 
-                    # Expr for pacman to be at this position at t+1
-                    nextToGo = pacmanSuccessorStateAxioms(x, y, t + 1, walls)
-                    KB = logic.conjoin(KB, nextToGo)
-
-        # Expr for pacman to be at goal position at t+1
-        goalProp = logic.PropSymbolExpr(pacman_str, goal[0], goal[1], t + 1)
+                    # Clauses for pacman to be at this position at t+1
+                    pacmanSuccessorStateClauses(KB, x, y, t + 1, walls)
 
-        # The model to be solved
-        modelToFind = logic.conjoin(KB, goalProp)
+        # Pacman at goal position at t+1
+        goalProp = KB.literal(pacman_str, goal[0], goal[1], t + 1)
 
+        # The goal only holds for this horizon, so assume it rather than add it
         solution = False
-        solution = findModel(modelToFind)
+        solution = KB.solve([[goalProp]])
 
         # Extract the sequence only when the solution is found
         if solution:
@@ -348,8 +362,12 @@ def foodLogicPlan(problem):
     actions = [game.Directions.EAST, game.Directions.WEST, game.Directions.NORTH, game.Directions.SOUTH]
 
 
-    # Start position expr
-    pathKB = logic.PropSymbolExpr(pacman_str, start[0], start[1], 1)
+    # The path KB only grows with t, so each step just adds its own clauses,
+    # built straight as integer clauses
+    pathKB = logic.ClauseStore()
+
+    # Start position
+    pathKB.addClause([pathKB.literal(pacman_str, start[0], start[1], 1)])
 
 
     t = 1
@@ -358,63 +376,40 @@ def foodLogicPlan(problem):
     for x in xrange(1, width + 1):
         for y in xrange(1, height + 1):
             if not walls[x][y] and (x, y) != start:
-                notStartHere = ~logic.PropSymbolExpr(pacman_str, x, y, 1)
-                pathKB = logic.conjoin(pathKB, notStartHere)
+                pathKB.addClause([-pathKB.literal(pacman_str, x, y, 1)])
 
     while t <= 50:
 
         # For each step, foodKB does not necessarily base on the previous one
         foodKB = []
-        eachFood = []
 
         # One and only one action at one time
-        currentActions = [logic.PropSymbolExpr(action, t) for action in actions]
-        onlyAction = exactlyOne(currentActions)
-        pathKB = logic.conjoin(pathKB, onlyAction)
+        pathKB.addExactlyOne([pathKB.literal(action, t) for action in actions])
 
 
         # All the moves should be legal
         for x in xrange(1, width + 1):
             for y in xrange(1, height + 1):
                 if not walls[x][y]:
-                    nextToGo = pacmanSuccessorStateAxioms(x, y, t + 1, walls)
-                    pathKB = logic.conjoin(pathKB, nextToGo)
-
-
+                    pacmanSuccessorStateClauses(pathKB, x, y, t + 1, walls)
 
-        # onlyOnePos = []
-        #
-        # for x in xrange(1, width + 1):
-        #     for y in xrange(1, height + 1):
-        #         if not walls[x][y]:
-        #             onlyOne = logic.PropSymbolExpr(pacman_str, x, y, t)
-        #             onlyOnePos.append(onlyOne)
-        #
-        # KB = logic.conjoin(onlyOnePos)
+        # Pacman is somewhere at t+1, otherwise nothing stops the last action
+        # from walking into a wall
+        pathKB.addClause([pathKB.literal(pacman_str, x, y, t + 1)
+                          for x in xrange(1, width + 1)
+                          for y in xrange(1, height + 1) if not walls[x][y]])
 
         # Each food should be visited at least once in the past time
         for x in xrange(1, width + 1):
             for y in xrange(1, height + 1):
                 if food[x][y]:
-                    for timePassed in xrange(1, t+1):
-                        oneFood = logic.PropSymbolExpr(pacman_str, x, y, timePassed)
-                        eachFood.append(oneFood)
-
-                    eachFoodVisited = atLeastOne(eachFood)
-
+                    eachFoodVisited = [pathKB.literal(pacman_str, x, y, timePassed)
+                                       for timePassed in xrange(1, t+1)]
                     foodKB.append(eachFoodVisited)
 
-                    # Flush the foods, because the next one would be different
-                    eachFood = []
-
-        foodKB = logic.conjoin(foodKB)
-        combKB = logic.conjoin(foodKB, pathKB)
-
+        # foodKB only holds for this horizon, so assume it rather than add it
         solution = False
-
-
-        solution = findModel(combKB)
-
+        solution = pathKB.solve(foodKB)
 
         if solution:
             return extractActionSequence(solution, actions)
@@ -426,6 +421,3 @@ def foodLogicPlan(problem):
 # Abbreviations
 plp = positionLogicPlan
 flp = foodLogicPlan
-
-# Some for the logic module uses pretty deep recursion on long expressions
-sys.setrecursionlimit(100000)
@@ -14,6 +14,7 @@
 
 import sys
 import inspect
+import bisect
 import heapq, random
 import cStringIO
 
@@ -161,29 +162,72 @@ class PriorityQueue:
       in quick retrieval of the lowest-priority item in the queue. This
       data structure allows O(1) access to the lowest-priority item.
 
-      Note that this PriorityQueue does not allow you to change the priority
-      of an item.  However, you may insert the same item multiple times with
-      different priorities.
+      You may insert the same item multiple times with different priorities
+      using push.  For hashable items, update lowers the priority of an item
+      that is already queued instead of adding another copy (decrease-key).
+      The superseded heap entry is only marked as removed and is thrown away
+      when it reaches the top of the heap.
     """
+    REMOVED = object()  # marks superseded heap entries
+
     def  __init__(self):
         self.heap = []
         self.count = 0
+        self.entries = {}   # item -> its lowest-priority queued entry
+        self.size = 0       # number of queued entries that are not removed
 
     def push(self, item, priority):
-        # FIXME: restored old behaviour to check against old results better
-        # FIXED: restored to stable behaviour
-        entry = (priority, self.count, item)
-        # entry = (priority, item)
+        entry = [priority, self.count, item]
         heapq.heappush(self.heap, entry)
         self.count += 1
+        self.size += 1
+        try:
+            best = self.entries.get(item)
+        except TypeError:
+            return # unhashable items can be pushed, but not updated
+        if best is None or priority < best[0]:
+            self.entries[item] = entry
 
     def pop(self):
-        (_, _, item) = heapq.heappop(self.heap)
-        #  (_, item) = heapq.heappop(self.heap)
+        entry = heapq.heappop(self.heap)
+        while entry[2] is PriorityQueue.REMOVED:
+            entry = heapq.heappop(self.heap)
+        item = entry[2]
+        self.size -= 1
+        try:
+            if self.entries.get(item) is entry:
+                del self.entries[item]
+        except TypeError:
+            pass
         return item
 
+    def update(self, item, priority):
+        # If item already in priority queue with higher priority, update its priority.
+        # If item already in priority queue with equal or lower priority, do nothing.
+        # If item not in priority queue, do the same thing as self.push.
+        # Returns True if the queue was changed.
+        entry = self.entries.get(item)
+        if entry is None:
+            self.push(item, priority)
+            return True
+        if entry[0] <= priority:
+            return False
+        # The new entry keeps the insertion count, so ties still break by first push
+        entry[2] = PriorityQueue.REMOVED
+        entry = [priority, entry[1], item]
+        self.entries[item] = entry
+        heapq.heappush(self.heap, entry)
+        return True
+
     def isEmpty(self):
-        return len(self.heap) == 0
+        return self.size == 0
+
+    def __contains__(self, item):
+        # An item pushed several times stays queued until its lowest-priority copy is popped
+        return item in self.entries
+
+    def __len__(self):
+        return self.size
 
 class PriorityQueueWithFunction(PriorityQueue):
     """
@@ -452,35 +496,38 @@ def normalize(vectorOrCounter):
         if s == 0: return vector
         return [el / s for el in vector]
 
-def nSample(distribution, values, n):
+def cumulativeDistribution(distribution):
+    """
+    Returns the running totals of a vector of probabilities, normalizing it
+    first if it does not sum to 1.  A distribution that is sampled from many
+    times can be turned into running totals once and handed to
+    sampleFromCumulative for each draw.
+    """
     if sum(distribution) != 1:
         distribution = normalize(distribution)
+    cumulative = []
+    total = 0
+    for prob in distribution:
+        total += prob
+        cumulative.append(total)
+    return cumulative
+
+def sampleFromCumulative(cumulative, values):
+    "Samples one of values, given the running totals of their probabilities"
+    return values[min(bisect.bisect_left(cumulative, random.random()), len(values) - 1)]
+
+def nSample(distribution, values, n):
+    cumulative = cumulativeDistribution(distribution)
     rand = [random.random() for i in range(n)]
     rand.sort()
-    samples = []
-    samplePos, distPos, cdf = 0,0, distribution[0]
-    while samplePos < n:
-        if rand[samplePos] < cdf:
-            samplePos += 1
-            samples.append(values[distPos])
-        else:
-            distPos += 1
-            cdf += distribution[distPos]
-    return samples
+    return [values[min(bisect.bisect_right(cumulative, r), len(values) - 1)] for r in rand]
 
 def sample(distribution, values = None):
     if type(distribution) == Counter:
         items = sorted(distribution.items())
         distribution = [i[1] for i in items]
         values = [i[0] for i in items]
-    if sum(distribution) != 1:
-        distribution = normalize(distribution)
-    choice = random.random()
-    i, total= 0, distribution[0]
-    while choice > total:
-        i += 1
-        total += distribution[i]
-    return values[i]
+    return sampleFromCumulative(cumulativeDistribution(distribution), values)
 
 def sampleFromCounter(ctr):
     items = sorted(ctr.items())
@@ -13,14 +13,20 @@
 
 
 import bayesNet as bn
+import distanceCalculator
 import game
 from game import Actions, Agent, Directions
 import inference
 import layout
 import factorOperations
+import hashlib
+import inspect
 import itertools
 import operator as op
+import os
 import random
+import sys
+import time
 import util
 
 from hunters import GHOST_COLLISION_REWARD, WON_GAME_REWARD
@@ -125,6 +131,69 @@ def fillCPTs(bayesNet, gameState):
     fillHouseCPT(bayesNet, gameState)
     fillObsCPT(bayesNet, gameState)
 
+# Directory in which BayesAgent caches filled Bayes nets across runs, for
+# example os.path.join(tempfile.gettempdir(), 'pacman-bayesnets'); None
+# fills the CPTs in every game.  Only the BAYES_NET_CACHE_SIZE most
+# recently used nets are kept.
+BAYES_NET_CACHE_DIR = None
+BAYES_NET_CACHE_SIZE = 32
+
+def bayesNetKey(gameState):
+    """
+    A hash of everything the filled Bayes net of gameState is made from:
+    the layout, the PROB_* constants and the source of this module, where
+    the fill functions are.  It names the cached net.
+    """
+    layoutText = '\n'.join(gameState.data.layout.layoutText)
+    constants = set([(name, value) for (name, value) in vars(layout).items() + globals().items()
+                     if name.startswith('PROB_')])
+    sourceDigest = hashlib.sha1(inspect.getsource(sys.modules[__name__])).hexdigest()
+    return hashlib.sha1('%s%r\n%s\n%s' % (bn.BAYES_NET_FILE_MAGIC, sorted(constants),
+                                          sourceDigest, layoutText)).hexdigest()
+
+def constructFilledBayesNet(gameState, cacheDir=None):
+    """
+    Returns constructBayesNet(gameState) with its CPTs filled by fillCPTs.
+
+    If cacheDir is not None, the filled net is saved there under
+    bayesNetKey(gameState), so later games on the same layout load it
+    instead of filling the CPTs again.  A cached net whose structure does
+    not match the constructed one is ignored and overwritten.
+    """
+    net, obsVars = constructBayesNet(gameState)
+    if cacheDir is None:
+        fillCPTs(net, gameState)
+        return net, obsVars
+
+    path = os.path.join(cacheDir, bayesNetKey(gameState) + '.bn')
+    try:
+        cachedNet = bn.loadBayesNet(path)
+        if cachedNet.variablesSet() == net.variablesSet() and \
+                cachedNet.inEdges() == net.inEdges() and \
+                cachedNet.variableDomainsDict() == net.variableDomainsDict():
+            os.utime(path, None) # mark it as recently used
+            return cachedNet, obsVars
+    except (IOError, OSError):
+        pass
+
+    fillCPTs(net, gameState)
+    try:
+        if not os.path.isdir(cacheDir):
+            os.makedirs(cacheDir)
+        bn.saveBayesNet(net, path)
+        evictBayesNets(cacheDir, BAYES_NET_CACHE_SIZE)
+    except (IOError, OSError):
+        pass # The cache is only an optimization
+    return net, obsVars
+
+def evictBayesNets(cacheDir, cacheSize):
+    " Deletes all but the cacheSize most recently used nets in cacheDir "
+    paths = [os.path.join(cacheDir, name) for name in os.listdir(cacheDir) if name.endswith('.bn')]
+    if len(paths) > cacheSize:
+        paths.sort(key=os.path.getmtime)
+        for path in paths[:len(paths) - cacheSize]:
+            os.remove(path)
+
 def fillXCPT(bayesNet, gameState):
     from layout import PROB_FOOD_LEFT
     xFactor = bn.Factor([X_POS_VAR], [], bayesNet.variableDomainsDict())
@@ -273,14 +342,16 @@ def getMostLikelyFoodHousePosition(evidence, bayesNet, eliminationOrder):
     (This should be a very short method.)
     """
     "*** YOUR CODE HERE ***"
-    factor = inference.inferenceByVariableElimination(bayesNet, HOUSE_VARS, evidence, eliminationOrder)
+    # the unobserved observation variables are barren, so only the houses,
+    # the position and the evidence take part, and the posterior is only
+    # recomputed when the evidence changes
+    factor = inference.cachedInferenceByVariableElimination(bayesNet, HOUSE_VARS, evidence, eliminationOrder)
     return max(factor.getAllPossibleAssignmentDicts(), key = lambda x: factor.getProbability(x))
 
 class BayesAgent(game.Agent):
 
     def registerInitialState(self, gameState):
-        self.bayesNet, self.obsVars = constructBayesNet(gameState)
-        fillCPTs(self.bayesNet, gameState)
+        self.bayesNet, self.obsVars = constructFilledBayesNet(gameState, BAYES_NET_CACHE_DIR)
 
         self.distances = cacheDistances(gameState)
         self.visited = set()
@@ -339,9 +410,11 @@ class BayesAgent(game.Agent):
 
 class VPIAgent(BayesAgent):
 
-    def __init__(self):
+    def __init__(self, showTimings='False'):
         BayesAgent.__init__(self)
         self.behavior = None
+        self.showTimings = showTimings == 'True'
+        self.exploreTimings = []
         NORTH = Directions.NORTH
         SOUTH = Directions.SOUTH
         EAST = Directions.EAST
@@ -350,6 +423,10 @@ class VPIAgent(BayesAgent):
                 list(reversed([NORTH, NORTH, NORTH, NORTH, EAST, EAST, EAST,
                     EAST, SOUTH, SOUTH, SOUTH, SOUTH, WEST, WEST, WEST, WEST]))
 
+    def registerInitialState(self, gameState):
+        BayesAgent.registerInitialState(self, gameState)
+        self.junctionTree = inference.JunctionTree(self.bayesNet)
+
     def reveal(self, gameState):
         bottomLeftPos, topLeftPos, bottomRightPos, topRightPos = \
                 gameState.getPossibleHouses()
@@ -357,17 +434,85 @@ class VPIAgent(BayesAgent):
             for ox, oy in gameState.getHouseWalls(housePos):
                 gameState.data.observedPositions[ox][oy] = True
 
+    def computeEnterValues(self, evidence, eliminationOrder):
+        """
+        Returns the expected values of entering the top left house and of
+        entering the top right house given evidence: entering the food house
+        wins the game and entering the ghost house loses it.
+        """
+        houseMarginals = inference.cachedInferenceByVariableElimination(self.bayesNet,
+                HOUSE_VARS, evidence, eliminationOrder)
+        return self.enterValues(houseMarginals, evidence)
+
+    def enterValues(self, houseMarginals, evidence):
+        " The values of computeEnterValues, from a factor over the houses "
+        leftAssignment = dict(evidence)
+        leftAssignment.update({FOOD_HOUSE_VAR: TOP_LEFT_VAL, GHOST_HOUSE_VAR: TOP_RIGHT_VAL})
+        rightAssignment = dict(evidence)
+        rightAssignment.update({FOOD_HOUSE_VAR: TOP_RIGHT_VAL, GHOST_HOUSE_VAR: TOP_LEFT_VAL})
+        foodLeftProb = houseMarginals.getProbability(leftAssignment)
+        foodRightProb = houseMarginals.getProbability(rightAssignment)
+
+        leftExpectedValue = foodLeftProb * WON_GAME_REWARD + foodRightProb * GHOST_COLLISION_REWARD
+        rightExpectedValue = foodRightProb * WON_GAME_REWARD + foodLeftProb * GHOST_COLLISION_REWARD
+        return leftExpectedValue, rightExpectedValue
+
+    def computeExploreValue(self, evidence, enterEliminationOrder):
+        """
+        Returns the expected value of observing the remaining walls and then
+        entering the better house given what they show.
+
+        The observations only depend on the houses, so the posterior over
+        the houses after each outcome is the posterior given evidence times
+        the likelihoods of the outcome's observations.  All the outcomes are
+        evaluated from that one posterior instead of an inference each.
+
+        The time spent on each outcome is kept in self.exploreTimings, and
+        printed when the agent is made with showTimings=True.
+        """
+        startTime = time.time()
+        probsAndOutcomes = self.getExplorationProbsAndOutcomes(evidence)
+        self.junctionTree.setEvidence(evidence)
+        housePosterior = self.junctionTree.getMarginal(HOUSE_VARS)
+        variableDomainsDict = self.bayesNet.variableDomainsDict()
+        self.exploreTimings = [('posterior', time.time() - startTime)]
+
+        # P(obsVar = value | houses) for each observation an outcome can make
+        likelihoods = {}
+        expectedValue = 0.0
+        for nRed, (outcomeProb, outcomeEvidence) in enumerate(probsAndOutcomes):
+            startTime = time.time()
+            if outcomeProb > 0:
+                factors = [housePosterior]
+                for obsVar in outcomeEvidence:
+                    if obsVar in evidence:
+                        continue
+                    key = (obsVar, outcomeEvidence[obsVar])
+                    if key not in likelihoods:
+                        likelihoods[key] = bn.Factor(HOUSE_VARS, [], variableDomainsDict)
+                        likelihoods[key].fillWithSum(self.bayesNet.getCPTWithEvidence(obsVar, dict([key])))
+                    factors.append(likelihoods[key])
+                outcomePosterior = bn.Factor(HOUSE_VARS, [], variableDomainsDict)
+                outcomePosterior.fillWithProduct(factors)
+                outcomePosterior = factorOperations.normalize(outcomePosterior)
+                expectedValue += outcomeProb * max(self.enterValues(outcomePosterior, {}))
+            self.exploreTimings.append(('%d red' % nRed, time.time() - startTime))
+
+        if self.showTimings:
+            for name, seconds in self.exploreTimings:
+                print 'VPI %s: %.4f seconds' % (name, seconds)
+        return expectedValue
+
     def getExplorationProbsAndOutcomes(self, evidence):
         unknownVars = [o for o in self.obsVars if o not in evidence]
         assert len(unknownVars) == 7
         assert len(set(evidence.keys()) & set(unknownVars)) == 0
         firstUnk = unknownVars[0]
-        restUnk = unknownVars[1:]
 
-        unknownVars = [o for o in self.obsVars if o not in evidence]
-        eliminationOrder = unknownVars + [X_POS_VAR, Y_POS_VAR]
-        houseMarginals = inference.inferenceByVariableElimination(self.bayesNet,
-                [FOOD_HOUSE_VAR, GHOST_HOUSE_VAR], evidence, eliminationOrder)
+        # the queries below only differ in the house evidence, so the junction
+        # tree reuses the messages from the observations between them
+        self.junctionTree.setEvidence(evidence)
+        houseMarginals = self.junctionTree.getMarginal([FOOD_HOUSE_VAR, GHOST_HOUSE_VAR])
 
         probs = [0 for i in range(8)]
         outcomes = []
@@ -384,9 +529,11 @@ class VPIAgent(BayesAgent):
             condEvidence.update({FOOD_HOUSE_VAR: foodHouseVal,
                 GHOST_HOUSE_VAR: ghostHouseVal})
             assignmentProb = houseMarginals.getProbability(condEvidence)
+            if assignmentProb == 0:
+                continue
 
-            oneObsMarginal = inference.inferenceByVariableElimination(self.bayesNet,
-                    [firstUnk], condEvidence, restUnk + [X_POS_VAR, Y_POS_VAR])
+            self.junctionTree.setEvidence(condEvidence)
+            oneObsMarginal = self.junctionTree.getMarginal([firstUnk])
 
             assignment = oneObsMarginal.getAllPossibleAssignmentDicts()[0]
             assignment[firstUnk] = RED_OBS_VAL
@@ -470,26 +617,11 @@ class VPIAgent(BayesAgent):
             return self.enterAction(gameState, left=False)
 
 def cacheDistances(state):
-    width, height = state.data.layout.width, state.data.layout.height
-    states = [(x, y) for x in range(width) for y in range(height)]
-    walls = state.getWalls().asList() + state.data.layout.redWalls.asList() + state.data.layout.blueWalls.asList()
-    states = [s for s in states if s not in walls]
-    distances = {}
-    for i in states:
-        for j in states:
-            if i == j:
-                distances[i, j] = 0
-            elif util.manhattanDistance(i, j) == 1:
-                distances[i, j] = 1
-            else:
-                distances[i, j] = 999999
-    for k in states:
-        for i in states:
-            for j in states:
-                if distances[i,j] > distances[i,k] + distances[k,j]:
-                    distances[i,j] = distances[i,k] + distances[k,j]
-
-    return distances
+    # Red and blue walls block Pacman just like ordinary walls
+    walls = state.getWalls().copy()
+    for x, y in state.data.layout.redWalls.asList() + state.data.layout.blueWalls.asList():
+        walls[x][y] = True
+    return distanceCalculator.getMazeDistances(walls)
 
 # http://stackoverflow.com/questions/4941753/is-there-a-math-ncr-function-in-python
 def combinations(n, r):
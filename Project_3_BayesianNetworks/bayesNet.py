@@ -12,11 +12,62 @@
 # Pieter Abbeel (pabbeel@cs.berkeley.edu).
 
 
+import array
+import hashlib
 import itertools
+import marshal
+import mmap
+import os
+import struct
 from collections import defaultdict
 import random
 from copy import deepcopy, copy
 
+# A factor keeps only its nonzero entries when fewer than this fraction of
+# its entries are nonzero, as in the deterministic CPTs of bayesAgents
+SPARSE_DENSITY = 0.25
+
+class VariableDomains(dict):
+    """
+    A read-only {variable : domain} dict whose domains are tuples.
+
+    Bayes nets and factors hand these out instead of copies, and a factor
+    made from one keeps it rather than copying it, so the domains of a net
+    are shared by all of its factors.  Use dict(variableDomains) to get a
+    copy that can be changed.
+    """
+
+    def __readOnly(self, *args, **kwargs):
+        raise TypeError, ("VariableDomains can't be changed, use dict() " +
+                          "to make a copy that can be")
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = __readOnly
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (VariableDomains, (dict(self),))
+
+    def valueIndices(self, variable):
+        " Returns a dict from each value in the domain of variable to its index "
+        indices = self.__dict__.setdefault('_valueIndices', {})
+        if variable not in indices:
+            indices[variable] = dict([(value, i) for i, value in enumerate(self[variable])])
+        return indices[variable]
+
+def shareVariableDomains(variableDomainsDict):
+    """
+    Returns variableDomainsDict as VariableDomains, which is variableDomainsDict
+    itself if it already is.
+    """
+    if isinstance(variableDomainsDict, VariableDomains):
+        return variableDomainsDict
+    return VariableDomains([(variable, tuple(domain)) for (variable, domain) in variableDomainsDict.items()])
+
 class BayesNet(object):
 
     def __init__(self, variables, inputInEdges, inputOutEdges, inputVariableDomains):
@@ -52,16 +103,17 @@ class BayesNet(object):
             if variable not in self.__outEdges:
                 self.__outEdges[variable] = set()
 
-        self.__variableDomainsDict = inputVariableDomains
+        self.__variableDomainsDict = shareVariableDomains(inputVariableDomains)
         self.__CPTDict = {}
+        self.__fingerprint = None # computed by fingerprint, cleared by setCPT
 
     def variablesSet(self):
         " Returns a copy of the set of variables in the bayes net "
         return copy(self.__variablesSet)
 
     def variableDomainsDict(self):
-        " Returns a copy of the variable domains in the bayes net "
-        return deepcopy(self.__variableDomainsDict)
+        " Returns the variable domains in the bayes net, as a read-only VariableDomains "
+        return self.__variableDomainsDict
 
     def inEdges(self):
         " Returns a copy of the incoming edges in the bayes net "
@@ -168,6 +220,26 @@ class BayesNet(object):
                                        "\nparent: " + str(var))
 
             self.__CPTDict[variable] = deepcopy(CPT)
+            self.__fingerprint = None
+
+    def fingerprint(self):
+        """
+        Returns a hash of the variables, edges, domains and conditional
+        probability tables of the bayes net, so two nets with the same
+        fingerprint give the same answers to every query.  It changes
+        whenever setCPT is called with a different table.
+        """
+        if self.__fingerprint is None:
+            digest = hashlib.sha1()
+            for variable in self.__variables:
+                digest.update(repr((variable, sorted(self.__inEdges[variable]),
+                                    list(self.__variableDomainsDict[variable]))))
+                if variable in self.__CPTDict:
+                    CPT = self.__CPTDict[variable]
+                    digest.update(repr([(sorted(assignmentDict.items()), float(CPT.getProbability(assignmentDict)))
+                                        for assignmentDict in CPT.getAllPossibleAssignmentDicts()]))
+            self.__fingerprint = digest.hexdigest()
+        return self.__fingerprint
 
     def getReducedVariableDomains(self, evidenceDict):
         """
@@ -178,7 +250,7 @@ class BayesNet(object):
         variable's domain is the single value that it is being
         assigned to (and is otherwise unchanged).
         """
-        reducedVariableDomainsDict = self.variableDomainsDict()
+        reducedVariableDomainsDict = dict(self.__variableDomainsDict)
         for (evidenceVariable, value) in evidenceDict.items():
             reducedVariableDomainsDict[evidenceVariable] = [value]
         return reducedVariableDomainsDict
@@ -258,24 +330,39 @@ class Factor(object):
         self.__variables = tuple(inputUnconditionedVariables) + tuple(inputConditionedVariables) # variables are unique string identifiersk
         self.__variablesSet = set(self.__variables)
 
-        if not self.__variablesSet.issubset(set(inputVariableDomainsDict.keys())): # it's okay for variableDomainsDict to have more items than needed
+        if not all([variable in inputVariableDomainsDict for variable in self.__variablesSet]): # it's okay for variableDomainsDict to have more items than needed
             raise ValueError, ("variableDomainsDict doesn't have all the input variables \n" \
                                + str(self.__variablesSet))
 
         self.__unconditionedVariables = set(inputUnconditionedVariables)
         self.__conditionedVariables = set(inputConditionedVariables)
-        self.__variableDomainsDict = deepcopy(inputVariableDomainsDict) # dict that maps {variable : variableDomain}
+        self.__variableDomainsDict = shareVariableDomains(inputVariableDomainsDict) # dict that maps {variable : variableDomain}
 
         self.__variableOrders = dict([(variable, i) for i, variable in enumerate(self.__variables)]) # internal order of the variables
-        self.__probDict = {} # probability values are stored in an {assignmentValuesTuple : probability} dict,
-                            # since we can't index using assignmentDicts. this is why we have to sort
-        products = list(itertools.product(*[inputVariableDomainsDict[variable] for variable in self.__variables]))
-        for assignmentsInOrder in products:
-            self.__probDict[tuple(assignmentsInOrder)] = 0.0
+
+        # Probability values are stored in a flat list with one axis per
+        # variable: the row of an assignment is the sum over the variables of
+        # (index of the value in the domain) * (stride of the variable).
+        # The first variable has stride 1, so the rows are in the order of
+        # getAllPossibleAssignmentDicts.
+        # The table is only allocated when it is first written, so while it
+        # is None every entry is 0.0.  When most entries are 0.0 it is a dict
+        # from the rows of the nonzero entries to their values instead.
+        self.__domains = [self.__variableDomainsDict[variable] for variable in self.__variables]
+        self.__valueIndices = [self.__variableDomainsDict.valueIndices(variable) for variable in self.__variables]
+        self.__strides = []
+        self.__numRows = 1
+        for domain in self.__domains:
+            self.__strides.append(self.__numRows)
+            self.__numRows *= len(domain)
+        self.__table = None
 
     def variableDomainsDict(self):
-        " Retuns a copy of the variable domains in the factor "
-        return deepcopy(self.__variableDomainsDict)
+        """
+        Retuns the variable domains in the factor, as a read-only
+        VariableDomains that is shared rather than copied
+        """
+        return self.__variableDomainsDict
 
     def variables(self):
         " Retuns a copy of the tuple of variables in the factor "
@@ -283,15 +370,29 @@ class Factor(object):
 
     def variablesSet(self):
         " Retuns a copy of the set of variables in the factor "
-        return copy(self.__variablesSet)
+        return set(self.__variablesSet)
 
     def unconditionedVariables(self):
         " Retuns a copy of the unconditioned variables in the factor "
-        return copy(self.__unconditionedVariables)
+        return set(self.__unconditionedVariables)
 
     def conditionedVariables(self):
         " Retuns a copy of the conditioned variables in the factor "
-        return copy(self.__conditionedVariables)
+        return set(self.__conditionedVariables)
+
+    def __deepcopy__(self, memo):
+        """
+        Copies the probability table and everything that the factor hands
+        out copies of; the rest is never changed after construction and is
+        shared with the copy.
+        """
+        newFactor = copy(self)
+        newFactor.__variablesSet = copy(self.__variablesSet)
+        newFactor.__unconditionedVariables = copy(self.__unconditionedVariables)
+        newFactor.__conditionedVariables = copy(self.__conditionedVariables)
+        if self.__table is not None:
+            newFactor.__storeTable(copy(self.__table))
+        return newFactor
 
     def __eq__(self, other):
         """
@@ -348,12 +449,12 @@ class Factor(object):
         Returns the probability entry stored in the factor for that 
         combination of variable assignments.
         """
-        assignmentsInOrder = self.__getAssignmentsInOrder(assignmentDict)
-        if assignmentsInOrder not in self.__probDict:
+        row = self.__getRow(assignmentDict)
+        if row is None:
             raise ValueError, ("The input assignmentDict is not contained in this factor: \n" \
                                 +  str(self) + str(assignmentDict))
         else:
-            return self.__probDict[assignmentsInOrder]
+            return self.__probabilityOfRow(row)
 
     def setProbability(self, assignmentDict, probability):
         """ 
@@ -376,40 +477,256 @@ class Factor(object):
                                str(probability))
         else:
 
-            assignmentsInOrder = self.__getAssignmentsInOrder(assignmentDict)
-            if assignmentsInOrder not in self.__probDict:
+            row = self.__getRow(assignmentDict)
+            if row is None:
                 raise ValueError, ("The input assignmentDict is not contained in this factor: \n" \
                                   +  str(self) + str(assignmentDict))
             else:
-                self.__probDict[assignmentsInOrder] = probability
+                if self.__table is None:
+                    self.__table = [0.0] * self.__numRows
+                if not isinstance(self.__table, dict):
+                    self.__table[row] = probability
+                elif probability != 0:
+                    self.__table[row] = probability
+                else:
+                    self.__table.pop(row, None)
 
-    def __getAssignmentsInOrder(self, assignmentDict):
+    def __getRow(self, assignmentDict):
         """
         Internal utility function for interacting with the stored
-        probability dictionary.
+        probability table.
 
-        We would like to store a probability value for each
-        assignmentDict, but dicts aren't hashable since they're
-        mutable, so we can't have a dict with dicts as keys.  
-        So we store the probability table in a dict where the keys are
-        tuples of variable values, without the variable name
-        associated with the value.
-
-        This function takes an assignmentDict and processes it into an
-        ordered tuple of values where the values are the assignments
-        in assignmentDict.
-        We can then use this tuple to directly index into the
-        probability table dict.
+        Returns the index into the table of the row for assignmentDict,
+        or None if assignmentDict leaves out a variable of this factor or
+        assigns it a value outside its domain.
 
         Use factor.getProbability and factor.setProbability instead,
         for a better interface.
         """
-        reducedAssignmentDict = dict([(var, val) for (var, val) \
-                                      in assignmentDict.items() if var in self.__variablesSet])
-        variablesAndAssignments = reducedAssignmentDict.items()
-        variablesAndAssignments = sorted(variablesAndAssignments, \
-                                         key=lambda (var, val) : self.__variableOrders[var])
-        return tuple([val for (var, val) in variablesAndAssignments])
+        row = 0
+        for variable, valueIndices, stride in zip(self.__variables, self.__valueIndices, self.__strides):
+            if variable not in assignmentDict:
+                return None
+            valueIndex = valueIndices.get(assignmentDict[variable])
+            if valueIndex is None:
+                return None
+            row += valueIndex * stride
+        return row
+
+    def __getRowsMatching(self, factor):
+        """
+        Internal utility function for operations between factors.
+
+        Returns a list with, for each row of factor, the index of the row
+        of this factor that agrees with it on the variables both factors
+        contain.  Variables only in factor are ignored, so that a row of
+        this factor can match many rows of factor.
+        """
+        rows = [0]
+        for variable, domain in zip(factor.__variables, factor.__domains):
+            if variable in self.__variableOrders:
+                order = self.__variableOrders[variable]
+                valueIndices, stride = self.__valueIndices[order], self.__strides[order]
+                if not all(value in valueIndices for value in domain):
+                    raise ValueError, ("The domain of " + str(variable) + " in factor \n" + str(factor) +
+                                       "is not contained in this factor: \n" + str(self))
+                offsets = [valueIndices[value] * stride for value in domain]
+            else:
+                offsets = [0] * len(domain)
+            # Later variables have larger strides, so their offsets vary slowest
+            rows = [row + offset for offset in offsets for row in rows]
+        return rows
+
+    def fillWithProduct(self, factors):
+        """
+        Sets each entry of this factor to the product of the rows of
+        factors that agree with it.  The variables of each of factors
+        must be contained in this factor.
+
+        This is the table of joinFactors(factors).
+        """
+        sparseFactors = [factor for factor in factors if isinstance(factor.__table, dict)]
+        if sparseFactors:
+            self.__storeTable(self.__sparseProduct(factors, sparseFactors))
+            return
+
+        table = [1] * self.__numRows
+        for factor in factors:
+            otherTable = factor.__denseTable()
+            rows = factor.__getRowsMatching(self)
+            table = [p * otherTable[row] for p, row in zip(table, rows)]
+        self.__storeTable(table)
+
+    def __sparseProduct(self, factors, sparseFactors):
+        """
+        The nonzero entries of the product of factors, found by extending
+        each nonzero row of the sparse factor with the fewest of them to
+        the variables it leaves out and looking up the other factors.
+        """
+        driver = min(sparseFactors, key=lambda factor: len(factor.__table))
+        others = [factor for factor in factors if factor is not driver]
+        toSelf = driver.__rowTranslation(self)
+        toOthers = [self.__rowTranslation(factor) for factor in others]
+
+        freeOffsets = [0]
+        for variable, domain, stride in zip(self.__variables, self.__domains, self.__strides):
+            if variable not in driver.__variableOrders:
+                freeOffsets = [offset + i * stride for i in range(len(domain)) for offset in freeOffsets]
+
+        table = {}
+        for driverRow, driverProbability in driver.__table.iteritems():
+            baseRow = toSelf(driverRow)
+            if baseRow is None:
+                continue
+            for offset in freeOffsets:
+                row = baseRow + offset
+                probability = driverProbability
+                for factor, toOther in zip(others, toOthers):
+                    probability *= factor.__probabilityOfRow(toOther(row))
+                    if probability == 0:
+                        break
+                if probability != 0:
+                    table[row] = probability
+        return table
+
+    def __rowTranslation(self, factor):
+        """
+        Returns a function taking a row of this factor to the row of factor
+        that agrees with it on the variables they share, or to None if a
+        value of the row is not in the domain of factor.
+        """
+        axes = []
+        for variable, domain, stride in zip(self.__variables, self.__domains, self.__strides):
+            if variable in factor.__variableOrders:
+                order = factor.__variableOrders[variable]
+                valueIndices, otherStride = factor.__valueIndices[order], factor.__strides[order]
+                offsets = [valueIndices[value] * otherStride if value in valueIndices else None
+                           for value in domain]
+                axes.append((stride, len(domain), offsets))
+
+        def translate(row):
+            otherRow = 0
+            for stride, size, offsets in axes:
+                offset = offsets[(row // stride) % size]
+                if offset is None:
+                    return None
+                otherRow += offset
+            return otherRow
+        return translate
+
+    def __probabilityOfRow(self, row):
+        " The entry in row of the table, or 0.0 if row is None "
+        if row is None or self.__table is None:
+            return 0.0
+        elif isinstance(self.__table, dict):
+            return self.__table.get(row, 0.0)
+        else:
+            return self.__table[row]
+
+    def fillWithSum(self, factor):
+        """
+        Sets each entry of this factor to the sum of the rows of factor
+        that agree with it, summing out the variables of factor that are
+        not in this factor.
+
+        This is the table of eliminate(factor, variable).
+        """
+        if isinstance(factor.__table, dict):
+            toSelf = factor.__rowTranslation(self)
+            table = {}
+            for otherRow, probability in factor.__table.iteritems():
+                row = toSelf(otherRow)
+                if row is not None:
+                    table[row] = table.get(row, 0.0) + probability
+            self.__storeTable(table)
+            return
+
+        otherTable = factor.__denseTable()
+        rows = factor.__getRowsMatching(self)
+        # Offsets of the rows of factor that differ only in summed out variables
+        summedRows = [0]
+        for variable, domain, stride in zip(factor.__variables, factor.__domains, factor.__strides):
+            if variable not in self.__variableOrders:
+                summedRows = [summedRow + i * stride for i in range(len(domain)) for summedRow in summedRows]
+        self.__storeTable([sum([otherTable[row + summedRow] for summedRow in summedRows], 0.0) for row in rows])
+
+    def fillWithRowsOf(self, factor):
+        """
+        Sets each entry of this factor to the row of factor that agrees
+        with it.  Both factors must contain the same variables, but this
+        factor may have smaller domains or its variables in another order.
+        """
+        if isinstance(factor.__table, dict):
+            otherTable = factor.__table
+            self.__storeTable([otherTable.get(row, 0.0) for row in factor.__getRowsMatching(self)])
+        else:
+            otherTable = factor.__denseTable()
+            self.__storeTable([otherTable[row] for row in factor.__getRowsMatching(self)])
+
+    def fillWithTable(self, table):
+        """
+        Sets the entries of this factor to those of table, a sequence with
+        one entry per assignment in the order of getAllPossibleAssignmentDicts.
+        The entries are copied, so table can be changed or reused afterwards.
+        """
+        if len(table) != self.__numRows:
+            raise ValueError, ("The table has " + str(len(table)) + " entries but the factor " +
+                               "has " + str(self.__numRows) + " rows:\n" + str(self))
+        self.__storeTable(list(table))
+
+    def divideBy(self, denominator):
+        " Divides every entry of this factor by denominator "
+        if isinstance(self.__table, dict):
+            self.__table = dict([(row, probability / denominator)
+                                 for (row, probability) in self.__table.iteritems()])
+        elif self.__table is not None:
+            self.__table = [probability / denominator for probability in self.__table]
+
+    def totalProbability(self):
+        " Returns the sum of all the entries of this factor "
+        if self.__table is None:
+            return 0.0
+        elif isinstance(self.__table, dict):
+            return sum(self.__table.itervalues())
+        else:
+            return sum(self.__table)
+
+    def isSparse(self):
+        " Returns whether only the nonzero entries of this factor are stored "
+        return isinstance(self.__table, dict)
+
+    def __denseTable(self):
+        " The probability table as a list, without changing this factor "
+        if self.__table is None:
+            return [0.0] * self.__numRows
+        if isinstance(self.__table, dict):
+            table = [0.0] * self.__numRows
+            for row, probability in self.__table.iteritems():
+                table[row] = probability
+            return table
+        return self.__table
+
+    def __storeTable(self, table):
+        """
+        Stores table, a list of every entry or a dict of the nonzero ones,
+        as a dict if fewer than SPARSE_DENSITY of the entries are nonzero
+        and as a list otherwise.
+        """
+        if isinstance(table, dict):
+            numNonzero = len(table)
+        else:
+            numNonzero = self.__numRows - table.count(0)
+        if numNonzero < SPARSE_DENSITY * self.__numRows:
+            if not isinstance(table, dict):
+                table = dict([(row, probability) for (row, probability) in enumerate(table) if probability != 0])
+            self.__table = table
+        else:
+            if isinstance(table, dict):
+                denseTable = [0.0] * self.__numRows
+                for row, probability in table.iteritems():
+                    denseTable[row] = probability
+                table = denseTable
+            self.__table = table
 
     def getAllPossibleAssignmentDicts(self):
         """
@@ -553,9 +870,7 @@ class Factor(object):
                                             " value: " + str(value))
 
         newFactor = Factor(self.unconditionedVariables(), self.conditionedVariables(), newVariableDomainsDict)
-
-        for assignmentDict in newFactor.getAllPossibleAssignmentDicts():
-            newFactor.setProbability(assignmentDict, self.getProbability(assignmentDict))
+        newFactor.fillWithRowsOf(self)
 
         return newFactor
 
@@ -708,6 +1023,169 @@ def reduceBayesNetVariablesWithEvidence(bayesNet, variablesToRemove,
 
     return newBayesNet
 
+def pruneBayesNetForQuery(bayesNet, queryVariables, evidenceDict):
+    """
+    Prunes the variables that cannot change the answer to the query
+    P(queryVariables | evidenceDict) away from the Bayes net.
+
+    Variables that are not ancestors of a query or evidence variable are
+    barren: summing them out of their CPTs gives 1.  Of the rest, the
+    variables that the evidence separates from the query variables in
+    the moral graph only contribute a constant, which normalizing divides
+    out, along with the evidence that only touches them.
+
+    Returns a tuple of
+    (Bayes net over the remaining variables, evidence on those variables)
+    """
+    queryVariablesSet = set(queryVariables)
+    evidenceVariables = set(evidenceDict.keys())
+    inEdges = bayesNet.inEdges()
+
+    # the ancestral set of the query and evidence variables
+    ancestors = set()
+    frontier = list(queryVariablesSet | evidenceVariables)
+    while frontier:
+        variable = frontier.pop()
+        if variable not in ancestors:
+            ancestors.add(variable)
+            frontier.extend(inEdges[variable])
+
+    # the moral graph of the ancestral set
+    neighbors = dict([(variable, set()) for variable in ancestors])
+    for child in ancestors:
+        family = set(inEdges[child]) | set([child])
+        for variable in family:
+            neighbors[variable] |= family
+
+    # the variables connected to the query without passing through evidence,
+    # and the evidence next to them
+    connected = set()
+    frontier = list(queryVariablesSet)
+    while frontier:
+        variable = frontier.pop()
+        if variable not in connected:
+            connected.add(variable)
+            if variable not in evidenceVariables:
+                frontier.extend(neighbors[variable])
+
+    prunedEvidenceDict = dict([(variable, value) for (variable, value) in evidenceDict.items()
+                               if variable in connected])
+    prunedBayesNet = reduceBayesNetVariablesWithEvidence(bayesNet,
+            bayesNet.variablesSet() - connected, prunedEvidenceDict)
+    return prunedBayesNet, prunedEvidenceDict
+
+
+BAYES_NET_FILE_MAGIC = 'BAYESNET1\n'
+
+def saveBayesNet(bayesNet, path):
+    """
+    Writes bayesNet to path in a binary format that loadBayesNet reads.
+
+    The file holds BAYES_NET_FILE_MAGIC, the length of a marshalled header,
+    the header itself, padding to a multiple of 8 bytes and then the rows of
+    every CPT as one flat table of doubles.  The header has the variables,
+    edges and domains, and for each CPT its variables and where its rows
+    start in the table.  The rows of a CPT are in the order of its
+    getAllPossibleAssignmentDicts, so loading never looks up an assignment.
+
+    The file is written under a temporary name and then renamed, so a
+    reader never sees half of it.
+    """
+    inEdges = bayesNet.inEdges()
+    CPTHeaders = []
+    table = array.array('d')
+    for variable in sorted(bayesNet.variablesSet()):
+        CPT = bayesNet.getCPT(variable)
+        CPTHeaders.append((variable, CPT.variables(), len(CPT.unconditionedVariables()), len(table)))
+        table.extend([CPT.getProbability(assignmentDict)
+                      for assignmentDict in CPT.getAllPossibleAssignmentDicts()])
+    header = marshal.dumps((sorted(bayesNet.variablesSet()),
+                            [(variable, sorted(inEdges[variable])) for variable in sorted(inEdges)],
+                            dict([(variable, tuple(domain)) for (variable, domain)
+                                  in bayesNet.variableDomainsDict().items()]),
+                            CPTHeaders))
+    padding = -(len(BAYES_NET_FILE_MAGIC) + 8 + len(header)) % 8
+
+    tmpPath = '%s.%d.tmp' % (path, os.getpid())
+    f = open(tmpPath, 'wb')
+    try:
+        f.write(BAYES_NET_FILE_MAGIC)
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        f.write('\0' * padding)
+        table.tofile(f)
+    finally:
+        f.close()
+    os.rename(tmpPath, path)
+
+def loadBayesNet(path):
+    """
+    Reads a Bayes net written by saveBayesNet, memory-mapping the file and
+    copying each CPT's rows straight into its factor.
+
+    Raises IOError if path does not hold a Bayes net in this format.
+
+    >>> import tempfile
+    >>> random.seed(0)
+    >>> bayesNet = constructRandomlyFilledBayesNet(['A', 'B', 'C'],
+    ...                                            [('A', 'B'), ('B', 'C'), ('A', 'C')],
+    ...                                            {'A': [0, 1], 'B': ['x', 'y', 'z'],
+    ...                                             'C': [True, False]})
+    >>> fh, path = tempfile.mkstemp()
+    >>> os.close(fh)
+    >>> saveBayesNet(bayesNet, path)
+    >>> loaded = loadBayesNet(path)
+    >>> loaded.sameGraph(bayesNet), loaded.fingerprint() == bayesNet.fingerprint()
+    (True, True)
+    >>> all([loaded.getCPT(variable) == bayesNet.getCPT(variable) for variable in bayesNet.variablesSet()])
+    True
+    >>> open(path, 'wb').write('not a Bayes net file')
+    >>> loadBayesNet(path)  # doctest: +ELLIPSIS
+    Traceback (most recent call last):
+        ...
+    IOError: Not a Bayes net file: ...
+    >>> os.remove(path)
+    """
+    f = open(path, 'rb')
+    try:
+        if os.fstat(f.fileno()).st_size < len(BAYES_NET_FILE_MAGIC) + 8:
+            raise IOError, ("Not a Bayes net file: " + path)
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        f.close()
+
+    try:
+        if mapped[:len(BAYES_NET_FILE_MAGIC)] != BAYES_NET_FILE_MAGIC:
+            raise IOError, ("Not a Bayes net file: " + path)
+        headerStart = len(BAYES_NET_FILE_MAGIC) + 8
+        headerLength = struct.unpack('<Q', mapped[len(BAYES_NET_FILE_MAGIC):headerStart])[0]
+        try:
+            variables, edges, variableDomainsDict, CPTHeaders = \
+                    marshal.loads(mapped[headerStart:headerStart + headerLength])
+        except (ValueError, EOFError, TypeError):
+            raise IOError, ("Corrupt Bayes net file: " + path)
+        tableStart = headerStart + headerLength
+        tableStart += -tableStart % 8
+
+        edgeTuplesList = [(parent, child) for (child, parents) in edges for parent in parents]
+        bayesNet = constructEmptyBayesNet(variables, edgeTuplesList, variableDomainsDict)
+        domains = bayesNet.variableDomainsDict()
+        itemSize = array.array('d').itemsize
+        for variable, CPTVariables, numUnconditioned, rowStart in CPTHeaders:
+            CPT = Factor(CPTVariables[:numUnconditioned], CPTVariables[numUnconditioned:], domains)
+            numRows = 1
+            for CPTVariable in CPTVariables:
+                numRows *= len(domains[CPTVariable])
+            start = tableStart + rowStart * itemSize
+            if start + numRows * itemSize > len(mapped):
+                raise IOError, ("Truncated Bayes net file: " + path)
+            table = array.array('d')
+            table.fromstring(mapped[start:start + numRows * itemSize])
+            CPT.fillWithTable(table)
+            bayesNet.setCPT(variable, CPT)
+        return bayesNet
+    finally:
+        mapped.close()
 
 def printStarterBayesNet():
     """
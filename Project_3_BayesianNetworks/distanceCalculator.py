@@ -0,0 +1,299 @@
+# distanceCalculator.py
+# ---------------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+# 
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+This file contains a Distancer object which computes and
+caches the shortest path between any two points in the maze. It
+returns a Manhattan distance between two points if the maze distance
+has not yet been calculated.
+
+Example:
+distancer = Distancer(gameState.data.layout)
+distancer.getDistance( (1,1), (10,10) )
+
+The Distancer object also serves as an example of sharing data
+safely among agents via a global dictionary (distanceMap),
+and performing asynchronous computation via threads. These
+examples may help you in designing your own objects, but you
+shouldn't need to modify the Distancer code in order to use its
+distances.
+"""
+
+import threading, sys, time, random
+import os, tempfile, hashlib, array, struct, mmap
+
+class Distancer:
+  def __init__(self, layout, background=True, default=10000):
+    """
+    Initialize with Distancer(layout).  Changing default is unnecessary.
+
+    This will start computing maze distances in the background and use them
+    as soon as they are ready.  In the meantime, it returns manhattan distance.
+
+    To compute all maze distances on initialization, set background=False
+    """
+    self._distances = None
+    self.default = default
+
+    # Start computing distances in the background; when the dc finishes,
+    # it will fill in self._distances for us.
+    dc = DistanceCalculator()
+    dc.setAttr(layout, self)
+    dc.setDaemon(True)
+    if background:
+      dc.start()
+    else:
+      dc.run()
+
+  def getDistance(self, pos1, pos2):
+    """
+    The getDistance function is the only one you'll need after you create the object.
+    """
+    if self._distances == None:
+      return manhattanDistance(pos1, pos2)
+    if isInt(pos1) and isInt(pos2):
+      return self.getDistanceOnGrid(pos1, pos2)
+    pos1Grids = getGrids2D(pos1)
+    pos2Grids = getGrids2D(pos2)
+    bestDistance = self.default
+    for pos1Snap, snap1Distance in pos1Grids:
+      for pos2Snap, snap2Distance in pos2Grids:
+        gridDistance = self.getDistanceOnGrid(pos1Snap, pos2Snap)
+        distance = gridDistance + snap1Distance + snap2Distance
+        if bestDistance > distance:
+          bestDistance = distance
+    return bestDistance
+
+  def getDistanceOnGrid(self, pos1, pos2):
+    key = (pos1, pos2)
+    if key in self._distances:
+      return self._distances[key]
+    else:
+      raise Exception("Positions not in grid: " + str(key))
+
+  def isReadyForMazeDistance(self):
+    return self._distances != None
+
+def manhattanDistance(x, y ):
+  return abs( x[0] - y[0] ) + abs( x[1] - y[1] )
+
+def isInt(pos):
+  x, y = pos
+  return x == int(x) and y == int(y)
+
+def getGrids2D(pos):
+  grids = []
+  for x, xDistance in getGrids1D(pos[0]):
+    for y, yDistance in getGrids1D(pos[1]):
+      grids.append(((x, y), xDistance + yDistance))
+  return grids
+
+def getGrids1D(x):
+  intX = int(x)
+  if x == int(x):
+    return [(x, 0)]
+  return [(intX, x-intX), (intX+1, intX+1-x)]
+
+##########################################
+# MACHINERY FOR COMPUTING MAZE DISTANCES #
+##########################################
+
+distanceMap = {}
+distanceMapSemaphore = threading.Semaphore(1)
+distanceThread = None
+
+def waitOnDistanceCalculator(t):
+  global distanceThread
+  if distanceThread != None:
+    time.sleep(t)
+
+class DistanceCalculator(threading.Thread):
+  def setAttr(self, layout, distancer, default = 10000):
+    self.layout = layout
+    self.distancer = distancer
+    self.default = default
+
+  def run(self):
+    global distanceMap, distanceThread
+    distanceMapSemaphore.acquire()
+
+    if self.layout.walls not in distanceMap:
+      if distanceThread != None: raise Exception('Multiple distance threads')
+      distanceThread = self
+
+      distances = computeDistances(self.layout)
+      print >>sys.stdout, '[Distancer]: Switching to maze distances'
+
+      distanceMap[self.layout.walls] = distances
+      distanceThread = None
+    else:
+      distances = distanceMap[self.layout.walls]
+
+    distanceMapSemaphore.release()
+    self.distancer._distances = distances
+
+# Directory for the on-disk distance tables; None keeps them in memory only
+DISTANCE_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'pacman-distances')
+
+class MazeDistances:
+    """
+    The maze distances between all pairs of open cells of a walls grid.
+
+    Every open cell has an id (its index in walls.asList(False)) and the
+    distances live in one flat table of unsigned shorts, where entry
+    id1 * numCells + id2 is the distance from cell id1 to cell id2.  The
+    table is filled by one breadth-first search per cell and written to
+    DISTANCE_CACHE_DIR under a hash of the walls, so later runs on the same
+    walls memory-map the file instead of searching again.
+
+    Lookups take a pair of positions, so the object can stand in for the
+    {(pos1, pos2): distance} dicts that the callers used to build.
+    """
+    UNREACHABLE = 0xFFFF
+    FORMAT = 'H'
+
+    def __init__(self, walls, cacheDir=None):
+        self.cells = walls.asList(False)
+        self.cellIds = dict((cell, i) for i, cell in enumerate(self.cells))
+        self.numCells = len(self.cells)
+        if self.numCells >= MazeDistances.UNREACHABLE:
+            raise Exception('Too many open cells for a distance table: %d' % self.numCells)
+        self.itemSize = struct.calcsize(MazeDistances.FORMAT)
+
+        self.table = None
+        path = None
+        if cacheDir != None:
+            path = os.path.join(cacheDir, 'maze-%s.dist' % wallsKey(walls))
+            self.table = self._mapTable(path)
+        if self.table == None:
+            self.table = self._computeTable(walls)
+            if path != None:
+                self._saveTable(path)
+
+    def _computeTable(self, walls):
+        neighbors = []
+        for x, y in self.cells:
+            adjacent = [(x, y+1), (x, y-1), (x+1, y), (x-1, y)]
+            neighbors.append([self.cellIds[cell] for cell in adjacent if cell in self.cellIds])
+
+        n = self.numCells
+        table = array.array(MazeDistances.FORMAT, [MazeDistances.UNREACHABLE]) * (n * n)
+        for source in range(n):
+            row = source * n
+            table[row + source] = 0
+            frontier = [source]
+            dist = 0
+            while frontier:
+                dist += 1
+                nextFrontier = []
+                for cell in frontier:
+                    for other in neighbors[cell]:
+                        if table[row + other] == MazeDistances.UNREACHABLE:
+                            table[row + other] = dist
+                            nextFrontier.append(other)
+                frontier = nextFrontier
+        return table
+
+    def _mapTable(self, path):
+        "Memory-maps a cached table, or returns None if there is no usable one"
+        size = self.numCells * self.numCells * self.itemSize
+        try:
+            f = open(path, 'rb')
+        except IOError:
+            return None
+        try:
+            if size == 0 or os.fstat(f.fileno()).st_size != size:
+                return None
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            f.close()
+
+    def _saveTable(self, path):
+        # Write to a temporary file first, so readers never see half a table
+        try:
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            tmpPath = '%s.%d.tmp' % (path, os.getpid())
+            f = open(tmpPath, 'wb')
+            try:
+                self.table.tofile(f)
+            finally:
+                f.close()
+            os.rename(tmpPath, path)
+        except (IOError, OSError):
+            pass # The cache is only an optimization
+
+    def getDistance(self, pos1, pos2, default=None):
+        """
+        Returns the maze distance between two open cells, or default if either
+        one is not an open cell or there is no path between them.
+        """
+        id1, id2 = self.cellIds.get(pos1), self.cellIds.get(pos2)
+        if id1 == None or id2 == None:
+            return default
+        index = id1 * self.numCells + id2
+        if isinstance(self.table, array.array):
+            distance = self.table[index]
+        else:
+            distance = struct.unpack_from(MazeDistances.FORMAT, self.table, index * self.itemSize)[0]
+        if distance == MazeDistances.UNREACHABLE:
+            return default
+        return distance
+
+    def __contains__(self, key):
+        pos1, pos2 = key
+        return pos1 in self.cellIds and pos2 in self.cellIds
+
+    def __getitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        return self.getDistance(key[0], key[1], sys.maxint)
+
+def wallsKey(walls):
+    "A hash of the walls grid that names its cached distance table"
+    rows = [''.join([walls[x][y] and '%' or ' ' for x in range(walls.width)]) for y in range(walls.height)]
+    return hashlib.sha1('%d %d\n%s' % (walls.width, walls.height, '\n'.join(rows))).hexdigest()
+
+mazeDistancesMap = {}
+
+# A layout's walls grid is one object shared by all of its game states, so
+# asking again with the grid asked about last skips hashing it.  Only that
+# one grid is held on to, so grids built afresh for each game are not kept.
+lastMazeDistances = (None, None)
+
+def getMazeDistances(walls):
+    """
+    Returns the MazeDistances of a walls grid, shared by everyone in this
+    process and cached on disk across runs.
+    """
+    global lastMazeDistances
+    lastWalls, distances = lastMazeDistances
+    if lastWalls is walls:
+        return distances
+    key = wallsKey(walls)
+    if key not in mazeDistancesMap:
+        mazeDistancesMap[key] = MazeDistances(walls, DISTANCE_CACHE_DIR)
+    lastMazeDistances = (walls, mazeDistancesMap[key])
+    return mazeDistancesMap[key]
+
+def computeDistances(layout):
+    return getMazeDistances(layout.walls)
+
+
+def getDistanceOnGrid(distances, pos1, pos2):
+    key = (pos1, pos2)
+    if key in distances:
+      return distances[key]
+    return 100000
+
@@ -115,11 +115,8 @@ def joinFactors(factors):
 
     joinedFactor = Factor(unconVars, conVars, varDomainDict)
 
-    for assignment in joinedFactor.getAllPossibleAssignmentDicts():
-        p = 1
-        for factor in factors:
-            p *= factor.getProbability(assignment)
-        joinedFactor.setProbability(assignment, p)
+    # Each row is the product of the rows of the factors that agree with it
+    joinedFactor.fillWithProduct(factors)
 
     return joinedFactor
 
@@ -178,8 +175,8 @@ def eliminateWithCallTracking(callTrackingList=None):
 
         newFactor = Factor(unconVars, conVars, varDomainDict)
 
-        for assignment in factor.getAllPossibleAssignmentDicts():
-            newFactor.setProbability(assignment, sum(map(lambda x: x.getProbability(assignment), [factor, newFactor])))
+        # Each row is the sum of the rows of factor over eliminationVariable
+        newFactor.fillWithSum(factor)
 
         return newFactor
 
@@ -238,7 +235,9 @@ def normalize(factor):
     "*** YOUR CODE HERE ***"
 
 
-    sumProb = sum(map(lambda x: factor.getProbability(x), factor.getAllPossibleAssignmentDicts()))
+    sumProb = factor.totalProbability()
+    if sumProb == 0:
+        return None
 
     conVars = factor.conditionedVariables()
     unconVars = factor.unconditionedVariables()
@@ -252,7 +251,7 @@ def normalize(factor):
 
     newFactor = Factor(unconVars, conVars, varDomainDict)
 
-    for assignment in factor.getAllPossibleAssignmentDicts():
-        newFactor.setProbability(assignment, factor.getProbability(assignment)/sumProb)
+    newFactor.fillWithRowsOf(factor)
+    newFactor.divideBy(sumProb)
 
     return newFactor
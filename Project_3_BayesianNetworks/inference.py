@@ -12,11 +12,16 @@
 # Pieter Abbeel (pabbeel@cs.berkeley.edu).
 
 
+import bisect
+import math
 import random
 import util
-from bayesNet import Factor
+from collections import OrderedDict
+from copy import deepcopy
+from bayesNet import Factor, pruneBayesNetForQuery
 from factorOperations import joinFactorsByVariableWithCallTracking, joinFactors
 from factorOperations import eliminateWithCallTracking, normalize
+from factorOperations import joinFactorsByVariable, eliminate
 
 def inferenceByEnumeration(bayesNet, queryVariables, evidenceDict):
     """
@@ -125,10 +130,10 @@ def inferenceByVariableEliminationWithCallTracking(callTrackingList=None):
         # this is for autograding -- don't modify
         joinFactorsByVariable = joinFactorsByVariableWithCallTracking(callTrackingList)
         eliminate             = eliminateWithCallTracking(callTrackingList)
-        if eliminationOrder is None: # set an arbitrary elimination order if None given
-            eliminationVariables = bayesNet.variablesSet() - set(queryVariables) -\
-                                   set(evidenceDict.keys())
-            eliminationOrder = sorted(list(eliminationVariables))
+        if eliminationOrder is None: # plan an elimination order if None given
+            eliminationOrder, largestFactorSize = planVariableElimination(bayesNet,
+                    queryVariables, evidenceDict)
+            checkPlannedFactorSize(largestFactorSize)
 
         "*** YOUR CODE HERE ***"
         curFactorList = bayesNet.getAllCPTsWithEvidence(evidenceDict)
@@ -149,6 +154,411 @@ def inferenceByVariableEliminationWithCallTracking(callTrackingList=None):
 
 inferenceByVariableElimination = inferenceByVariableEliminationWithCallTracking()
 
+def inferenceByVariableEliminationWithPruning(bayesNet, queryVariables, evidenceDict, eliminationOrder):
+    """
+    inferenceByVariableElimination on the part of bayesNet that can change
+    the answer (see pruneBayesNetForQuery), following eliminationOrder for
+    the variables that are left, or a planned order if it is None.
+
+    The answer is the same factor as without pruning: the evidence that was
+    pruned away is still among its conditioned variables, and it is None
+    when the evidence has probability 0.
+    """
+    prunedBayesNet, prunedEvidenceDict = pruneBayesNetForQuery(bayesNet, queryVariables, evidenceDict)
+    if eliminationOrder is not None:
+        remainingVariables = prunedBayesNet.variablesSet()
+        eliminationOrder = [variable for variable in eliminationOrder if variable in remainingVariables]
+    answer = inferenceByVariableElimination(prunedBayesNet, queryVariables, prunedEvidenceDict, eliminationOrder)
+    if answer is None or prunedEvidenceProbability(bayesNet, prunedBayesNet, evidenceDict) == 0:
+        return None
+    return conditionOnEvidence(answer, evidenceDict)
+
+def prunedEvidenceProbability(bayesNet, prunedBayesNet, evidenceDict):
+    """
+    Returns the constant that pruneBayesNetForQuery leaves out of
+    P(evidenceDict): the product of the CPTs that prunedBayesNet dropped or
+    replaced by 1, summed over the variables it dropped.  The evidence has
+    probability 0 exactly when this is 0 or the pruned net gives it
+    probability 0.
+
+    None of these CPTs mention a variable that is in prunedBayesNet and is
+    not evidence, or pruning would have kept their variables; the CPTs of
+    the barren variables sum to 1 and are left out.
+    """
+    evidenceVariables = set(evidenceDict.keys())
+    remainingVariables = prunedBayesNet.variablesSet()
+    inEdges = bayesNet.inEdges()
+
+    ancestors = set()
+    frontier = list(evidenceVariables)
+    while frontier:
+        variable = frontier.pop()
+        if variable not in ancestors:
+            ancestors.add(variable)
+            frontier.extend(inEdges[variable])
+
+    factors = []
+    for variable in ancestors:
+        if variable in remainingVariables:
+            if variable not in evidenceVariables or \
+                    any([parent in remainingVariables and parent not in evidenceVariables
+                         for parent in inEdges[variable]]):
+                continue
+        factors.append(bayesNet.getCPTWithEvidence(variable, evidenceDict))
+    if not factors:
+        return 1.0
+
+    for variable in sorted(ancestors - evidenceVariables - remainingVariables):
+        factors, joinedFactor = joinFactorsByVariable(factors, variable)
+        # a factor with variable as its only unconditioned variable sums to 1 over it
+        if len(joinedFactor.unconditionedVariables()) > 1:
+            factors.append(eliminate(joinedFactor, variable))
+    if not factors:
+        return 1.0
+    return joinFactors(factors).totalProbability()
+
+def conditionOnEvidence(factor, evidenceDict):
+    """
+    Returns factor with the evidence variables it does not contain added as
+    conditioned variables, each with its observed value as its only value.
+    """
+    missingVariables = [variable for variable in evidenceDict if variable not in factor.variablesSet()]
+    if not missingVariables:
+        return factor
+    variableDomainsDict = dict(factor.variableDomainsDict())
+    for variable in missingVariables:
+        variableDomainsDict[variable] = [evidenceDict[variable]]
+    newFactor = Factor(factor.unconditionedVariables(),
+                       factor.conditionedVariables() | set(missingVariables), variableDomainsDict)
+    for assignmentDict in newFactor.getAllPossibleAssignmentDicts():
+        newFactor.setProbability(assignmentDict, factor.getProbability(assignmentDict))
+    return newFactor
+
+class InferenceCache(object):
+    """
+    Remembers the answers of an inference function of the form
+    inferenceFunction(bayesNet, queryVariables, evidenceDict, eliminationOrder)
+    keyed by the fingerprint of the net and the query and evidence, so a
+    repeated query is only answered once.  The elimination order is not part
+    of the key since it does not change the answer.
+
+    Calling setCPT on a net changes its fingerprint, so answers for the old
+    tables are never returned; they are evicted with the other least
+    recently used answers once there are more than maxSize.
+    """
+
+    def __init__(self, inferenceFunction, maxSize=256):
+        self.inferenceFunction = inferenceFunction
+        self.maxSize = maxSize
+        self.answers = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, bayesNet, queryVariables, evidenceDict, eliminationOrder=None):
+        key = (bayesNet.fingerprint(), frozenset(queryVariables), frozenset(evidenceDict.items()))
+        if key in self.answers:
+            self.hits += 1
+            answer = self.answers.pop(key)
+        else:
+            self.misses += 1
+            answer = self.inferenceFunction(bayesNet, queryVariables, evidenceDict, eliminationOrder)
+            if len(self.answers) >= self.maxSize:
+                self.answers.popitem(last=False)
+        self.answers[key] = answer
+        # callers get their own copy, so changing it can't change the cache
+        return deepcopy(answer)
+
+    def clear(self):
+        self.answers.clear()
+        self.hits = 0
+        self.misses = 0
+
+cachedInferenceByVariableElimination = InferenceCache(inferenceByVariableEliminationWithPruning)
+
+def interactionGraph(bayesNet, evidenceDict):
+    """
+    Returns the graph, as a dict from each variable to the set of its
+    neighbors, in which two variables are neighbors if a CPT of bayesNet
+    contains both of them: each variable is joined to its parents, and
+    the parents of a child to each other.
+
+    Evidence variables only take one value, so they never make a factor
+    any larger and are left out.
+    """
+    evidenceVariables = set(evidenceDict.keys())
+    inEdges = bayesNet.inEdges()
+    neighbors = dict([(variable, set()) for variable in bayesNet.variablesSet() - evidenceVariables])
+    for child in bayesNet.variablesSet():
+        family = (set(inEdges.get(child, ())) | set([child])) - evidenceVariables
+        for variable in family:
+            neighbors[variable] |= family
+            neighbors[variable].discard(variable)
+    return neighbors
+
+def minDegreeCost(variable, neighbors, domainSizes):
+    " Number of variables in the factor made by eliminating variable, besides variable "
+    return len(neighbors[variable])
+
+def minFillCost(variable, neighbors, domainSizes):
+    " Number of edges that eliminating variable adds between its neighbors "
+    variableNeighbors = list(neighbors[variable])
+    return len([1 for i, u in enumerate(variableNeighbors) for w in variableNeighbors[i + 1:]
+                if w not in neighbors[u]])
+
+def weightedMinFillCost(variable, neighbors, domainSizes):
+    """
+    Sum over the edges that eliminating variable adds of the product of the
+    domain sizes of their ends
+    """
+    variableNeighbors = list(neighbors[variable])
+    return sum([domainSizes[u] * domainSizes[w] for i, u in enumerate(variableNeighbors)
+                for w in variableNeighbors[i + 1:] if w not in neighbors[u]])
+
+ELIMINATION_HEURISTICS = {
+    'minDegree': minDegreeCost,
+    'minFill': minFillCost,
+    'weightedMinFill': weightedMinFillCost,
+}
+
+def planVariableElimination(bayesNet, queryVariables, evidenceDict, heuristic='weightedMinFill'):
+    """
+    Picks an elimination order for the query P(queryVariables | evidenceDict)
+    by repeatedly eliminating the variable that the heuristic (a key of
+    ELIMINATION_HEURISTICS) rates cheapest, ties going to the variable that
+    sorts first.
+
+    Returns a tuple of
+    (eliminationOrder, number of rows in the largest factor that
+     inferenceByVariableElimination will build with that order)
+    """
+    cost = ELIMINATION_HEURISTICS[heuristic]
+    neighbors = interactionGraph(bayesNet, evidenceDict)
+    domainSizes = dict([(variable, len(domain)) for (variable, domain)
+                        in bayesNet.variableDomainsDict().items()])
+
+    def factorSize(variables):
+        return reduce(lambda size, variable: size * domainSizes[variable], variables, 1)
+
+    eliminationOrder = []
+    largestFactorSize = 1
+    remaining = set(neighbors.keys()) - set(queryVariables)
+    while remaining:
+        variable = min(sorted(remaining), key=lambda v: cost(v, neighbors, domainSizes))
+
+        # joining on variable makes a factor over it and its neighbors, and
+        # eliminating it leaves its neighbors all connected to each other
+        variableNeighbors = neighbors.pop(variable)
+        largestFactorSize = max(largestFactorSize, factorSize(variableNeighbors | set([variable])))
+        for neighbor in variableNeighbors:
+            neighbors[neighbor] |= variableNeighbors
+            neighbors[neighbor].discard(neighbor)
+            neighbors[neighbor].discard(variable)
+
+        remaining.remove(variable)
+        eliminationOrder.append(variable)
+
+    # the factors left over are joined into one over the query variables
+    largestFactorSize = max(largestFactorSize, factorSize(neighbors.keys()))
+    return eliminationOrder, largestFactorSize
+
+# Planned orders that build a factor with more rows than this are refused
+# before any factor is built, rather than running out of memory partway
+MAX_PLANNED_FACTOR_SIZE = 10 ** 7
+
+def checkPlannedFactorSize(largestFactorSize):
+    " Raises a ValueError if a plan's largest factor is over MAX_PLANNED_FACTOR_SIZE "
+    if largestFactorSize > MAX_PLANNED_FACTOR_SIZE:
+        raise ValueError, ("The planned elimination order builds a factor with " +
+                           str(largestFactorSize) + " rows, more than the " +
+                           str(MAX_PLANNED_FACTOR_SIZE) + " allowed by MAX_PLANNED_FACTOR_SIZE")
+
+class JunctionTree(object):
+    """
+    A clique tree compiled from a Bayes net, for answering many marginal
+    queries on the same net.
+
+    The cliques come from eliminating every variable of the net in a
+    planned order, and each CPT is multiplied into one clique that
+    contains its variables.  Messages between neighboring cliques are
+    computed lazily (Shafer-Shenoy, so no division) and kept until the
+    evidence behind them changes, so after one calibration all the
+    marginals for an evidence set are available, and adding or retracting
+    evidence only recomputes the messages leading away from the cliques it
+    touches.
+
+    >>> from bayesNet import constructEmptyBayesNet
+    >>> net = constructEmptyBayesNet(['A', 'B', 'C'], [('A', 'B'), ('B', 'C')],
+    ...                              {'A': [0, 1], 'B': [0, 1], 'C': [0, 1]})
+    >>> for variable, parents, table in [('A', [], [0.6, 0.4]),
+    ...                                  ('B', ['A'], [0.7, 0.3, 0.2, 0.8]),
+    ...                                  ('C', ['B'], [0.9, 0.1, 0.4, 0.6])]:
+    ...     CPT = Factor([variable], parents, net.variableDomainsDict())
+    ...     CPT.fillWithTable(table)
+    ...     net.setCPT(variable, CPT)
+    >>> tree = JunctionTree(net)
+    >>> round(tree.getMarginal(['A']).getProbability({'A': 1}), 4)
+    0.4
+    >>> tree.addEvidence('C', 1)
+    >>> round(tree.getMarginal(['A']).getProbability({'A': 1}), 4)
+    0.5714
+    >>> answer = inferenceByVariableElimination(net, ['A'], {'C': 1}, None)
+    >>> round(answer.getProbability({'A': 1, 'C': 1}), 4)
+    0.5714
+    >>> tree.addEvidence('A', 0)
+    >>> round(tree.getMarginal(['B']).getProbability({'B': 1}), 4)
+    0.72
+    >>> tree.retractEvidence('C')
+    >>> round(tree.getMarginal(['B']).getProbability({'B': 1}), 4)
+    0.3
+    >>> tree.retractEvidence('A')
+    >>> round(tree.getMarginal(['A']).getProbability({'A': 1}), 4)
+    0.4
+    """
+
+    def __init__(self, bayesNet, heuristic='weightedMinFill'):
+        self.variableDomainsDict = bayesNet.variableDomainsDict()
+
+        # triangulate the moral graph by eliminating every variable, keeping
+        # the cliques that are not contained in an earlier one
+        eliminationOrder, largestFactorSize = planVariableElimination(bayesNet, [], {}, heuristic)
+        checkPlannedFactorSize(largestFactorSize)
+        neighbors = interactionGraph(bayesNet, {})
+        self.cliques = []
+        for variable in eliminationOrder:
+            variableNeighbors = neighbors.pop(variable)
+            clique = variableNeighbors | set([variable])
+            if not any([clique <= otherClique for otherClique in self.cliques]):
+                self.cliques.append(clique)
+            for neighbor in variableNeighbors:
+                neighbors[neighbor] |= variableNeighbors
+                neighbors[neighbor].discard(neighbor)
+                neighbors[neighbor].discard(variable)
+
+        # a maximum spanning forest on the separator sizes has the running
+        # intersection property
+        candidateEdges = sorted([(-len(self.cliques[i] & self.cliques[j]), i, j)
+                                 for i in range(len(self.cliques))
+                                 for j in range(i + 1, len(self.cliques))
+                                 if self.cliques[i] & self.cliques[j]])
+        components = range(len(self.cliques))
+        self.neighbors = [set() for clique in self.cliques]
+        for negativeSize, i, j in candidateEdges:
+            componentI, componentJ = components[i], components[j]
+            if componentI != componentJ:
+                components = [componentI if component == componentJ else component
+                              for component in components]
+                self.neighbors[i].add(j)
+                self.neighbors[j].add(i)
+
+        self.CPTsByClique = [[] for clique in self.cliques]
+        for variable in bayesNet.variablesSet():
+            CPT = bayesNet.getCPT(variable)
+            self.CPTsByClique[self.cliqueContaining(CPT.variablesSet())].append(CPT)
+
+        self.evidenceDict = {}
+        self.potentials = [None] * len(self.cliques)
+        self.messages = {}
+
+    def cliqueContaining(self, variables):
+        """
+        Returns the index of the smallest clique that contains all of
+        variables.
+        """
+        variables = set(variables)
+        containing = [i for i in range(len(self.cliques)) if variables <= self.cliques[i]]
+        if len(containing) == 0:
+            raise ValueError, ("No clique of the junction tree contains all of the " +
+                               "variables: " + str(variables))
+        return min(containing, key=lambda i: len(self.cliques[i]))
+
+    def setEvidence(self, evidenceDict):
+        """
+        Makes evidenceDict the evidence for the following queries.  Only the
+        messages that depend on evidence variables that were added,
+        retracted or changed are recomputed.
+        """
+        changedVariables = [variable for variable in set(evidenceDict.keys()) | set(self.evidenceDict.keys())
+                            if evidenceDict.get(variable) != self.evidenceDict.get(variable)]
+        self.evidenceDict = dict(evidenceDict)
+        for variable in changedVariables:
+            self.invalidate(self.cliqueContaining([variable]))
+
+    def addEvidence(self, variable, value):
+        evidenceDict = dict(self.evidenceDict)
+        evidenceDict[variable] = value
+        self.setEvidence(evidenceDict)
+
+    def retractEvidence(self, variable):
+        evidenceDict = dict(self.evidenceDict)
+        del evidenceDict[variable]
+        self.setEvidence(evidenceDict)
+
+    def invalidate(self, changedClique):
+        " Drops the potential of changedClique and every message sent away from it "
+        self.potentials[changedClique] = None
+        stack = [changedClique]
+        visited = set(stack)
+        while stack:
+            clique = stack.pop()
+            for neighbor in self.neighbors[clique] - visited:
+                self.messages.pop((clique, neighbor), None)
+                visited.add(neighbor)
+                stack.append(neighbor)
+
+    def potential(self, clique):
+        """
+        The product of the CPTs assigned to clique, with the rows that
+        disagree with the evidence on its variables set to 0.
+        """
+        if self.potentials[clique] is None:
+            factors = list(self.CPTsByClique[clique])
+            for variable, value in self.evidenceDict.items():
+                if self.cliqueContaining([variable]) == clique:
+                    indicator = Factor([variable], [], self.variableDomainsDict)
+                    indicator.setProbability({variable: value}, 1.0)
+                    factors.append(indicator)
+            potential = Factor(self.cliques[clique], [], self.variableDomainsDict)
+            potential.fillWithProduct(factors)
+            self.potentials[clique] = potential
+        return self.potentials[clique]
+
+    def belief(self, clique, excludedNeighbor=None):
+        """
+        The product of the potential of clique and the messages from all
+        its neighbors except excludedNeighbor.
+        """
+        factors = [self.potential(clique)] + [self.message(neighbor, clique)
+                                              for neighbor in self.neighbors[clique]
+                                              if neighbor != excludedNeighbor]
+        belief = Factor(self.cliques[clique], [], self.variableDomainsDict)
+        belief.fillWithProduct(factors)
+        return belief
+
+    def message(self, fromClique, toClique):
+        " The message from fromClique to toClique, over their separator "
+        if (fromClique, toClique) not in self.messages:
+            separator = self.cliques[fromClique] & self.cliques[toClique]
+            message = Factor(separator, [], self.variableDomainsDict)
+            message.fillWithSum(self.belief(fromClique, toClique))
+            self.messages[(fromClique, toClique)] = message
+        return self.messages[(fromClique, toClique)]
+
+    def calibrate(self):
+        " Computes every message, so that all the marginals are ready "
+        for clique in range(len(self.cliques)):
+            for neighbor in self.neighbors[clique]:
+                self.message(clique, neighbor)
+
+    def getMarginal(self, queryVariables):
+        """
+        Returns the factor P(queryVariables | evidence), or None if the
+        evidence has probability 0.  queryVariables must all be in one
+        clique, as the variables of a CPT always are.
+        """
+        marginal = Factor(queryVariables, [], self.variableDomainsDict)
+        marginal.fillWithSum(self.belief(self.cliqueContaining(queryVariables)))
+        return normalize(marginal)
+
 def sampleFromFactorRandomSource(randomSource=None):
     if randomSource is None:
         randomSource = random.Random()
@@ -187,7 +597,7 @@ def sampleFromFactorRandomSource(randomSource=None):
 
             # Reduce the domains of the variables that have been
             # conditioned upon for this factor
-            newVariableDomainsDict = factor.variableDomainsDict()
+            newVariableDomainsDict = dict(factor.variableDomainsDict())
             for (var, assignment) in conditionedAssignments.items():
                 newVariableDomainsDict[var] = [assignment]
 
@@ -222,3 +632,283 @@ def sampleFromFactorRandomSource(randomSource=None):
     return sampleFromFactor
 
 sampleFromFactor = sampleFromFactorRandomSource()
+
+def conditionalDistributions(bayesNet):
+    """
+    Reads every CPT of bayesNet once, for samplers that need to look up
+    rows many times.
+
+    Returns a dict mapping each variable to a tuple of
+    (tuple of its parents, its domain,
+     dict mapping each tuple of parent values to the list of
+     probabilities of the values in its domain)
+    """
+    variableDomainsDict = bayesNet.variableDomainsDict()
+    distributions = {}
+    for variable in bayesNet.variablesSet():
+        CPT = bayesNet.getCPT(variable)
+        parents = tuple(sorted(CPT.conditionedVariables()))
+        domain = variableDomainsDict[variable]
+        valueIndices = dict([(value, i) for i, value in enumerate(domain)])
+        rows = {}
+        for assignmentDict in CPT.getAllPossibleAssignmentDicts():
+            parentValues = tuple([assignmentDict[parent] for parent in parents])
+            probabilities = rows.setdefault(parentValues, [0.0] * len(domain))
+            probabilities[valueIndices[assignmentDict[variable]]] = CPT.getProbability(assignmentDict)
+        distributions[variable] = (parents, domain, rows)
+    return distributions
+
+def cumulativeDistributions(rows):
+    " Maps each row of probabilities in rows to its running sums "
+    cumulativeRows = {}
+    for parentValues, probabilities in rows.items():
+        total = 0.0
+        cumulative = []
+        for probability in probabilities:
+            total += probability
+            cumulative.append(total)
+        cumulativeRows[parentValues] = cumulative
+    return cumulativeRows
+
+def drawColumn(randomSource, domain, cumulativeRows, parentValuesColumn):
+    """
+    Draws one value of a variable for each tuple of parent values in
+    parentValuesColumn.
+    """
+    column = []
+    for parentValues in parentValuesColumn:
+        cumulative = cumulativeRows[parentValues]
+        index = bisect.bisect_right(cumulative, randomSource.random() * cumulative[-1])
+        column.append(domain[min(index, len(domain) - 1)])
+    return column
+
+def parentValuesColumn(columns, parents, numSamples):
+    " The tuples of parent values of each of the numSamples samples in columns "
+    if len(parents) == 0:
+        return [()] * numSamples
+    return zip(*[columns[parent] for parent in parents])
+
+def estimateFactor(bayesNet, queryVariables, evidenceDict, columns, weights):
+    """
+    Returns the factor P(queryVariables | evidenceDict) estimated from the
+    weighted samples in columns, or None if all the weights are 0.
+    """
+    queryColumns = zip(*[columns[variable] for variable in queryVariables])
+    weightTotals = {}
+    for queryValues, weight in zip(queryColumns, weights):
+        weightTotals[queryValues] = weightTotals.get(queryValues, 0.0) + weight
+    totalWeight = sum(weightTotals.values())
+    if totalWeight == 0:
+        return None
+
+    estimate = Factor(queryVariables, evidenceDict.keys(),
+                      bayesNet.getReducedVariableDomains(evidenceDict))
+    for queryValues, weight in weightTotals.items():
+        assignmentDict = dict(zip(queryVariables, queryValues))
+        assignmentDict.update(evidenceDict)
+        estimate.setProbability(assignmentDict, weight / totalWeight)
+    return estimate
+
+def inferenceByRejectionSampling(bayesNet, queryVariables, evidenceDict, numSamples,
+                                 randomSource=None):
+    """
+    Estimates P(queryVariables | evidenceDict) from numSamples samples of
+    the whole net, drawn a variable at a time for all the samples at once
+    in the order of bayesNet.linearizeVariables.  Samples are thrown away
+    as soon as they disagree with an evidence variable.
+
+    randomSource is a random.Random, so a seeded one repeats the samples.
+
+    Returns a tuple of
+    (estimated factor, or None if every sample was rejected,
+     effective sample size, which is the number of samples kept)
+
+    All three samplers estimate P(A = 1 | C = 1) = 0.5714 on a small chain,
+    repeat their samples for the same seed and report an effective sample
+    size of at most numSamples:
+
+    >>> from bayesNet import constructEmptyBayesNet
+    >>> net = constructEmptyBayesNet(['A', 'B', 'C'], [('A', 'B'), ('B', 'C')],
+    ...                              {'A': [0, 1], 'B': [0, 1], 'C': [0, 1]})
+    >>> for variable, parents, table in [('A', [], [0.6, 0.4]),
+    ...                                  ('B', ['A'], [0.7, 0.3, 0.2, 0.8]),
+    ...                                  ('C', ['B'], [0.9, 0.1, 0.4, 0.6])]:
+    ...     CPT = Factor([variable], parents, net.variableDomainsDict())
+    ...     CPT.fillWithTable(table)
+    ...     net.setCPT(variable, CPT)
+    >>> for sampler in [inferenceByRejectionSampling, inferenceByLikelihoodWeighting,
+    ...                 inferenceByGibbsSampling]:
+    ...     estimate, effectiveSampleSize = sampler(net, ['A'], {'C': 1}, 10000,
+    ...                                             randomSource=random.Random(0))
+    ...     again = sampler(net, ['A'], {'C': 1}, 10000, randomSource=random.Random(0))
+    ...     print round(estimate.getProbability({'A': 1, 'C': 1}), 2),
+    ...     print round(estimate.totalProbability(), 6),
+    ...     print 0 < effectiveSampleSize <= 10000, again == (estimate, effectiveSampleSize)
+    0.57 1.0 True True
+    0.57 1.0 True True
+    0.57 1.0 True True
+    >>> inferenceByGibbsSampling(net, ['A'], {'C': 1}, 0)
+    Traceback (most recent call last):
+        ...
+    ValueError: numSamples must be positive, not 0
+    """
+    if numSamples <= 0:
+        raise ValueError, ("numSamples must be positive, not " + str(numSamples))
+    if randomSource is None:
+        randomSource = random.Random()
+    distributions = conditionalDistributions(bayesNet)
+
+    columns = {}
+    for variable in bayesNet.linearizeVariables():
+        parents, domain, rows = distributions[variable]
+        parentValues = parentValuesColumn(columns, parents, numSamples)
+        columns[variable] = drawColumn(randomSource, domain, cumulativeDistributions(rows), parentValues)
+        if variable in evidenceDict:
+            kept = [i for i, value in enumerate(columns[variable]) if value == evidenceDict[variable]]
+            columns = dict([(drawnVariable, [column[i] for i in kept])
+                            for (drawnVariable, column) in columns.items()])
+            numSamples = len(kept)
+
+    estimate = estimateFactor(bayesNet, queryVariables, evidenceDict, columns, [1.0] * numSamples)
+    return estimate, float(numSamples)
+
+def likelihoodWeightedSamples(bayesNet, distributions, evidenceDict, numSamples, randomSource):
+    """
+    Draws numSamples samples of bayesNet with the evidence variables fixed,
+    a variable at a time in the order of bayesNet.linearizeVariables.
+
+    Returns a tuple of
+    (dict mapping each variable to the list of its values in the samples,
+     list of the weights of the samples)
+    """
+    columns = {}
+    weights = [1.0] * numSamples
+    for variable in bayesNet.linearizeVariables():
+        parents, domain, rows = distributions[variable]
+        parentValues = parentValuesColumn(columns, parents, numSamples)
+        if variable in evidenceDict:
+            valueIndex = domain.index(evidenceDict[variable])
+            weights = [weight * rows[values][valueIndex] for weight, values in zip(weights, parentValues)]
+            columns[variable] = [evidenceDict[variable]] * numSamples
+        else:
+            columns[variable] = drawColumn(randomSource, domain, cumulativeDistributions(rows), parentValues)
+    return columns, weights
+
+def inferenceByLikelihoodWeighting(bayesNet, queryVariables, evidenceDict, numSamples,
+                                   randomSource=None):
+    """
+    Estimates P(queryVariables | evidenceDict) from numSamples samples in
+    which the evidence variables are fixed to their values and every sample
+    is weighted by the probability of the evidence given its parents.  All
+    the samples are drawn at once, a variable at a time, in the order of
+    bayesNet.linearizeVariables.
+
+    randomSource is a random.Random, so a seeded one repeats the samples.
+
+    Returns a tuple of
+    (estimated factor, or None if every weight is 0,
+     effective sample size (sum of weights) ** 2 / (sum of squared weights))
+    """
+    if numSamples <= 0:
+        raise ValueError, ("numSamples must be positive, not " + str(numSamples))
+    if randomSource is None:
+        randomSource = random.Random()
+    distributions = conditionalDistributions(bayesNet)
+    columns, weights = likelihoodWeightedSamples(bayesNet, distributions, evidenceDict,
+                                                 numSamples, randomSource)
+
+    estimate = estimateFactor(bayesNet, queryVariables, evidenceDict, columns, weights)
+    sumOfSquares = sum([weight * weight for weight in weights])
+    effectiveSampleSize = sum(weights) ** 2 / sumOfSquares if sumOfSquares > 0 else 0.0
+    return estimate, effectiveSampleSize
+
+def inferenceByGibbsSampling(bayesNet, queryVariables, evidenceDict, numSamples,
+                             burnIn=100, randomSource=None, numStarts=100):
+    """
+    Estimates P(queryVariables | evidenceDict) from a Gibbs chain that
+    resamples each non-evidence variable in turn given its Markov blanket.
+    The chain starts from the first of numStarts likelihood weighted samples
+    that has a nonzero weight, runs burnIn sweeps that are thrown away and
+    then keeps one sample per sweep.
+
+    randomSource is a random.Random, so a seeded one repeats the chain.
+
+    Returns a tuple of
+    (estimated factor, or None if no start agrees with the evidence,
+     effective sample size of the chain, from batch means of the indicator
+     of the most likely query assignment, see chainEffectiveSampleSize)
+    """
+    if numSamples <= 0:
+        raise ValueError, ("numSamples must be positive, not " + str(numSamples))
+    if randomSource is None:
+        randomSource = random.Random()
+    distributions = conditionalDistributions(bayesNet)
+    outEdges = bayesNet.outEdges()
+
+    # start from a sample that agrees with the evidence
+    columns, weights = likelihoodWeightedSamples(bayesNet, distributions, evidenceDict,
+                                                 numStarts, randomSource)
+    possibleStarts = [i for i, weight in enumerate(weights) if weight > 0]
+    if len(possibleStarts) == 0:
+        return None, 0.0
+    state = dict([(variable, column[possibleStarts[0]]) for (variable, column) in columns.items()])
+
+    def blanketProbabilities(variable):
+        " P(variable | the rest of state), up to a constant "
+        parents, domain, rows = distributions[variable]
+        probabilities = list(rows[tuple([state[parent] for parent in parents])])
+        for i, value in enumerate(domain):
+            if probabilities[i] == 0:
+                continue
+            state[variable] = value
+            for child in outEdges[variable]:
+                childParents, childDomain, childRows = distributions[child]
+                childProbabilities = childRows[tuple([state[parent] for parent in childParents])]
+                probabilities[i] *= childProbabilities[childDomain.index(state[child])]
+        return probabilities
+
+    hiddenVariables = [variable for variable in bayesNet.linearizeVariables()
+                       if variable not in evidenceDict]
+    columns = dict([(variable, []) for variable in queryVariables])
+    for sweep in range(burnIn + numSamples):
+        for variable in hiddenVariables:
+            domain = distributions[variable][1]
+            probabilities = blanketProbabilities(variable)
+            state[variable] = drawColumn(randomSource, domain, cumulativeDistributions({(): probabilities}),
+                                         [()])[0]
+        if sweep >= burnIn:
+            for variable in queryVariables:
+                columns[variable].append(state[variable])
+
+    estimate = estimateFactor(bayesNet, queryVariables, evidenceDict, columns, [1.0] * numSamples)
+    return estimate, chainEffectiveSampleSize(zip(*[columns[variable] for variable in queryVariables]))
+
+def chainEffectiveSampleSize(chain):
+    """
+    The effective sample size n * variance / (batch size * variance of the
+    batch means) of the indicator of the most common state of chain, using
+    int(sqrt(n)) batches of int(sqrt(n)) consecutive samples (the samples
+    after the last whole batch are left out).  Unlike summing
+    autocorrelations lag by lag this takes O(n) time however slowly the
+    chain mixes.  It is at most n.
+    """
+    numSamples = len(chain)
+    counts = {}
+    for state in chain:
+        counts[state] = counts.get(state, 0) + 1
+    mostCommon = max(counts.keys(), key=lambda state: counts[state])
+    indicators = [1.0 if state == mostCommon else 0.0 for state in chain]
+    mean = sum(indicators) / numSamples
+    variance = sum([(indicator - mean) ** 2 for indicator in indicators]) / numSamples
+    if variance == 0:
+        return float(numSamples)
+
+    batchSize = int(math.sqrt(numSamples))
+    numBatches = numSamples // batchSize
+    batchMeans = [sum(indicators[i * batchSize:(i + 1) * batchSize]) / batchSize
+                  for i in range(numBatches)]
+    batchedMean = sum(batchMeans) / numBatches
+    batchMeansVariance = sum([(batchMean - batchedMean) ** 2 for batchMean in batchMeans]) / numBatches
+    if batchMeansVariance == 0:
+        return float(numSamples)
+    return min(float(numSamples), numSamples * variance / (batchSize * batchMeansVariance))
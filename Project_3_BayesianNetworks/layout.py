@@ -14,7 +14,7 @@
 
 import util
 from util import manhattanDistance
-from game import Grid
+from game import Grid, BitGrid
 # from capsule import DefaultCapsule
 import os
 import random
@@ -45,7 +45,7 @@ class Layout:
             self.walls = Grid(self.width, self.height, False)
             self.redWalls = Grid(self.width, self.height, False)
             self.blueWalls = Grid(self.width, self.height, False)
-            self.food = Grid(self.width, self.height, False)
+            self.food = BitGrid(self.width, self.height, False)
             self.capsules = []
             self.agentPositions = []
             self.numGhosts = 0
@@ -38,24 +38,34 @@ SONAR_MAX = (SONAR_NOISE_RANGE - 1)/2
 SONAR_NOISE_VALUES = [i - SONAR_MAX for i in range(SONAR_NOISE_RANGE)]
 SONAR_DENOMINATOR = 2 ** SONAR_MAX  + 2 ** (SONAR_MAX + 1) - 2.0
 SONAR_NOISE_PROBS = [2 ** (SONAR_MAX-abs(v)) / SONAR_DENOMINATOR  for v in SONAR_NOISE_VALUES]
+SONAR_NOISE_CUMULATIVE = util.cumulativeDistribution(SONAR_NOISE_PROBS)
 
 def getNoisyDistance(pos1, pos2):
     if pos2[1] == 1: return None
     distance = util.manhattanDistance(pos1, pos2)
-    return max(0, distance + util.sample(SONAR_NOISE_PROBS, SONAR_NOISE_VALUES))
+    return max(0, distance + util.sampleFromCumulative(SONAR_NOISE_CUMULATIVE, SONAR_NOISE_VALUES))
+
+observationLikelihoods = {}
+def getObservationLikelihoods(noisyDistance):
+    """
+    Returns a list whose entry d is the probability P( noisyDistance | d ).
+    The list stops after the largest true distance with a nonzero probability.
+    """
+    if noisyDistance not in observationLikelihoods:
+        likelihoods = [0] * (max(1, noisyDistance + SONAR_MAX) + 1)
+        for error , prob in zip(SONAR_NOISE_VALUES, SONAR_NOISE_PROBS):
+            likelihoods[max(1, noisyDistance - error)] += prob
+        observationLikelihoods[noisyDistance] = likelihoods
+    return observationLikelihoods[noisyDistance]
 
-observationDistributions = {}
 def getObservationProbability(noisyDistance, trueDistance):
     """
     Returns the probability P( noisyDistance | trueDistance ).
     """
-    global observationDistributions
-    if noisyDistance not in observationDistributions:
-        distribution = util.Counter()
-        for error , prob in zip(SONAR_NOISE_VALUES, SONAR_NOISE_PROBS):
-            distribution[max(1, noisyDistance - error)] += prob
-        observationDistributions[noisyDistance] = distribution
-    return observationDistributions[noisyDistance][trueDistance]
+    likelihoods = getObservationLikelihoods(noisyDistance)
+    if 0 <= trueDistance < len(likelihoods):
+        return likelihoods[trueDistance]
+    return 0
 
 ###################################################
 # YOUR INTERFACE TO THE PACMAN WORLD: A GameState #
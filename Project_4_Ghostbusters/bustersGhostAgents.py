@@ -19,6 +19,8 @@ from util import manhattanDistance
 import util
 
 class StationaryGhost( ghostAgents.GhostAgent ):
+    stationaryPolicy = True
+
     def getDistribution( self, state ):
         dist = util.Counter()
         dist[Directions.STOP] = 1.0
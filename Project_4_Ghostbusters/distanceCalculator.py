@@ -31,6 +31,7 @@ distances.
 """
 
 import threading, sys, time, random
+import os, tempfile, hashlib, array, struct, mmap
 
 class Distancer:
   def __init__(self, layout, background=True, default=10000):
@@ -142,45 +143,152 @@ class DistanceCalculator(threading.Thread):
     distanceMapSemaphore.release()
     self.distancer._distances = distances
 
+# Directory for the on-disk distance tables; None keeps them in memory only
+DISTANCE_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'pacman-distances')
+
+class MazeDistances:
+    """
+    The maze distances between all pairs of open cells of a walls grid.
+
+    Every open cell has an id (its index in walls.asList(False)) and the
+    distances live in one flat table of unsigned shorts, where entry
+    id1 * numCells + id2 is the distance from cell id1 to cell id2.  The
+    table is filled by one breadth-first search per cell and written to
+    DISTANCE_CACHE_DIR under a hash of the walls, so later runs on the same
+    walls memory-map the file instead of searching again.
+
+    Lookups take a pair of positions, so the object can stand in for the
+    {(pos1, pos2): distance} dicts that the callers used to build.
+    """
+    UNREACHABLE = 0xFFFF
+    FORMAT = 'H'
+
+    def __init__(self, walls, cacheDir=None):
+        self.cells = walls.asList(False)
+        self.cellIds = dict((cell, i) for i, cell in enumerate(self.cells))
+        self.numCells = len(self.cells)
+        if self.numCells >= MazeDistances.UNREACHABLE:
+            raise Exception('Too many open cells for a distance table: %d' % self.numCells)
+        self.itemSize = struct.calcsize(MazeDistances.FORMAT)
+
+        self.table = None
+        path = None
+        if cacheDir != None:
+            path = os.path.join(cacheDir, 'maze-%s.dist' % wallsKey(walls))
+            self.table = self._mapTable(path)
+        if self.table == None:
+            self.table = self._computeTable(walls)
+            if path != None:
+                self._saveTable(path)
+
+    def _computeTable(self, walls):
+        neighbors = []
+        for x, y in self.cells:
+            adjacent = [(x, y+1), (x, y-1), (x+1, y), (x-1, y)]
+            neighbors.append([self.cellIds[cell] for cell in adjacent if cell in self.cellIds])
+
+        n = self.numCells
+        table = array.array(MazeDistances.FORMAT, [MazeDistances.UNREACHABLE]) * (n * n)
+        for source in range(n):
+            row = source * n
+            table[row + source] = 0
+            frontier = [source]
+            dist = 0
+            while frontier:
+                dist += 1
+                nextFrontier = []
+                for cell in frontier:
+                    for other in neighbors[cell]:
+                        if table[row + other] == MazeDistances.UNREACHABLE:
+                            table[row + other] = dist
+                            nextFrontier.append(other)
+                frontier = nextFrontier
+        return table
+
+    def _mapTable(self, path):
+        "Memory-maps a cached table, or returns None if there is no usable one"
+        size = self.numCells * self.numCells * self.itemSize
+        try:
+            f = open(path, 'rb')
+        except IOError:
+            return None
+        try:
+            if size == 0 or os.fstat(f.fileno()).st_size != size:
+                return None
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            f.close()
+
+    def _saveTable(self, path):
+        # Write to a temporary file first, so readers never see half a table
+        try:
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            tmpPath = '%s.%d.tmp' % (path, os.getpid())
+            f = open(tmpPath, 'wb')
+            try:
+                self.table.tofile(f)
+            finally:
+                f.close()
+            os.rename(tmpPath, path)
+        except (IOError, OSError):
+            pass # The cache is only an optimization
+
+    def getDistance(self, pos1, pos2, default=None):
+        """
+        Returns the maze distance between two open cells, or default if either
+        one is not an open cell or there is no path between them.
+        """
+        id1, id2 = self.cellIds.get(pos1), self.cellIds.get(pos2)
+        if id1 == None or id2 == None:
+            return default
+        index = id1 * self.numCells + id2
+        if isinstance(self.table, array.array):
+            distance = self.table[index]
+        else:
+            distance = struct.unpack_from(MazeDistances.FORMAT, self.table, index * self.itemSize)[0]
+        if distance == MazeDistances.UNREACHABLE:
+            return default
+        return distance
+
+    def __contains__(self, key):
+        pos1, pos2 = key
+        return pos1 in self.cellIds and pos2 in self.cellIds
+
+    def __getitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        return self.getDistance(key[0], key[1], sys.maxint)
+
+def wallsKey(walls):
+    "A hash of the walls grid that names its cached distance table"
+    rows = [''.join([walls[x][y] and '%' or ' ' for x in range(walls.width)]) for y in range(walls.height)]
+    return hashlib.sha1('%d %d\n%s' % (walls.width, walls.height, '\n'.join(rows))).hexdigest()
+
+mazeDistancesMap = {}
+
+# A layout's walls grid is one object shared by all of its game states, so
+# asking again with the grid asked about last skips hashing it.  Only that
+# one grid is held on to, so grids built afresh for each game are not kept.
+lastMazeDistances = (None, None)
+
+def getMazeDistances(walls):
+    """
+    Returns the MazeDistances of a walls grid, shared by everyone in this
+    process and cached on disk across runs.
+    """
+    global lastMazeDistances
+    lastWalls, distances = lastMazeDistances
+    if lastWalls is walls:
+        return distances
+    key = wallsKey(walls)
+    if key not in mazeDistancesMap:
+        mazeDistancesMap[key] = MazeDistances(walls, DISTANCE_CACHE_DIR)
+    lastMazeDistances = (walls, mazeDistancesMap[key])
+    return mazeDistancesMap[key]
+
 def computeDistances(layout):
-    distances = {}
-    allNodes = layout.walls.asList(False)
-    for source in allNodes:
-        dist = {}
-        closed = {}
-        for node in allNodes:
-            dist[node] = sys.maxint
-        import util
-        queue = util.PriorityQueue()
-        queue.push(source, 0)
-        dist[source] = 0
-        while not queue.isEmpty():
-            node = queue.pop()
-            if node in closed:
-                continue
-            closed[node] = True
-            nodeDist = dist[node]
-            adjacent = []
-            x, y = node
-            if not layout.isWall((x,y+1)):
-                adjacent.append((x,y+1))
-            if not layout.isWall((x,y-1)):
-                adjacent.append((x,y-1) )
-            if not layout.isWall((x+1,y)):
-                adjacent.append((x+1,y) )
-            if not layout.isWall((x-1,y)):
-                adjacent.append((x-1,y))
-            for other in adjacent:
-                if not other in dist:
-                    continue
-                oldDist = dist[other]
-                newDist = nodeDist+1
-                if newDist < oldDist:
-                    dist[other] = newDist
-                    queue.push(other, newDist)
-        for target in allNodes:
-            distances[(target, source)] = dist[target]
-    return distances
+    return getMazeDistances(layout.walls)
 
 
 def getDistanceOnGrid(distances, pos1, pos2):
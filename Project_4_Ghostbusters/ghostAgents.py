@@ -20,6 +20,13 @@ from util import manhattanDistance
 import util
 
 class GhostAgent( Agent ):
+    # True when getDistribution depends only on the ghost's own position,
+    # Pacman's position and whether the ghost is scared.  Inference modules
+    # always place an unscared ghost, so they may cache its transition model.
+    # Only the class that sets it is trusted: a subclass that overrides
+    # getDistribution must set it again itself to be cached.
+    stationaryPolicy = False
+
     def __init__( self, index ):
         self.index = index
 
@@ -36,6 +43,8 @@ class GhostAgent( Agent ):
 
 class RandomGhost( GhostAgent ):
     "A ghost that chooses a legal action uniformly at random."
+    stationaryPolicy = True
+
     def getDistribution( self, state ):
         dist = util.Counter()
         for a in state.getLegalActions( self.index ): dist[a] = 1.0
@@ -44,6 +53,8 @@ class RandomGhost( GhostAgent ):
 
 class DirectionalGhost( GhostAgent ):
     "A ghost that prefers to rush Pacman, or flee when scared."
+    stationaryPolicy = True
+
     def __init__( self, index, prob_attack=0.8, prob_scaredFlee=0.8 ):
         self.index = index
         self.prob_attack = prob_attack
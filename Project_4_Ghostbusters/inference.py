@@ -12,7 +12,7 @@
 # Pieter Abbeel (pabbeel@cs.berkeley.edu).
 
 
-import itertools
+import bisect
 import random
 import busters
 import game
@@ -24,11 +24,48 @@ class DiscreteDistribution(dict):
     """
     A DiscreteDistribution models belief distributions and weight distributions
     over a finite set of discrete keys.
+
+    sample keeps the keys and their running totals in self.sampleTable until
+    the distribution next changes, so every method that changes it resets
+    the table.
     """
+    def __init__(self, *args, **kwargs):
+        dict.__init__(self, *args, **kwargs)
+        self.sampleTable = None
+
     def __getitem__(self, key):
         self.setdefault(key, 0)
         return dict.__getitem__(self, key)
 
+    def __setitem__(self, key, value):
+        self.sampleTable = None
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        self.sampleTable = None
+        dict.__delitem__(self, key)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self.sampleTable = None
+        return dict.setdefault(self, key, default)
+
+    def update(self, *args, **kwargs):
+        self.sampleTable = None
+        dict.update(self, *args, **kwargs)
+
+    def pop(self, *args):
+        self.sampleTable = None
+        return dict.pop(self, *args)
+
+    def popitem(self):
+        self.sampleTable = None
+        return dict.popitem(self)
+
+    def clear(self):
+        self.sampleTable = None
+        dict.clear(self)
+
     def copy(self):
         """
         Return a copy of the distribution.
@@ -87,6 +124,13 @@ class DiscreteDistribution(dict):
         Draw a random sample from the distribution and return the key, weighted
         by the values associated with each key.
 
+        The first draw normalizes the distribution and stores its running
+        totals; later draws are a binary search until the distribution changes.
+        A random number that rounding leaves above the last running total
+        is clamped, as in util.sampleFromCumulative, to the last key with a
+        nonzero value.  If the distribution is empty or all its values are 0
+        there is nothing to draw and sample returns None.
+
         >>> dist = DiscreteDistribution()
         >>> dist['a'] = 1
         >>> dist['b'] = 2
@@ -102,19 +146,139 @@ class DiscreteDistribution(dict):
         0.4
         >>> round(samples.count('d') * 1.0/N, 1)
         0.0
+        >>> print DiscreteDistribution().sample()
+        None
         """
         "*** YOUR CODE HERE ***"
         # Q0(2)
-        self.normalize()
-        bar = random.random() # [0, 1)
-        sum = 0
-        for key in self:
-            if self[key] + sum >= bar:
-                return key
-            sum += self[key]
+        if self.sampleTable is None:
+            self.normalize()
+            values = self.values()
+            last = len(values) - 1
+            while last >= 0 and values[last] <= 0:
+                last -= 1
+            self.sampleTable = (self.keys(), cumulativeWeights(values), last)
+        keys, cumulative, last = self.sampleTable
+        if last < 0:
+            return None
+        return keys[min(bisect.bisect_left(cumulative, random.random()), last)] # [0, 1)
 
 
 
+def cumulativeWeights(weights):
+    """
+    Return the running totals of weights.
+    """
+    cumulative = []
+    total = 0.0
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+    return cumulative
+
+def selectAtPoints(cumulative, points):
+    """
+    Return, for each of the increasing points, the index of the first running
+    total in cumulative that exceeds it, in one pass over both lists.
+    """
+    indices = []
+    index = 0
+    last = len(cumulative) - 1
+    for point in points:
+        while index < last and cumulative[index] <= point:
+            index += 1
+        indices.append(index)
+    return indices
+
+def multinomialResample(weights, numSamples, randomSource=random):
+    """
+    Return numSamples indices into weights, each drawn independently with
+    probability proportional to its weight.  The draws are the ones that
+    calling sample numSamples times on a DiscreteDistribution holding the
+    weights in this order would make: one random number per draw, looked up
+    among the running totals of the normalized weights, and past the last
+    one only through rounding, in which case the last nonzero weight is
+    picked.
+
+    >>> indices = multinomialResample([1, 0, 4], 10000, random.Random(0))
+    >>> len(indices), indices.count(1), round(indices.count(2) / 10000.0, 1)
+    (10000, 0, 0.8)
+    >>> multinomialResample([1, 0, 4], 8, random.Random(0))
+    [2, 2, 2, 2, 2, 2, 2, 2]
+    """
+    total = float(sum(weights))
+    cumulative = cumulativeWeights([weight / total for weight in weights])
+    last = len(weights) - 1
+    while last > 0 and weights[last] <= 0:
+        last -= 1
+    return [min(bisect.bisect_left(cumulative, randomSource.random()), last)
+            for _ in range(numSamples)]
+
+def systematicResample(weights, numSamples, randomSource=random):
+    """
+    Return numSamples indices into weights, chosen at the evenly spaced
+    points (i + u) / numSamples of the total weight for a single random u.
+    Every index is chosen within one of its expected number of times.
+
+    >>> systematicResample([1, 0, 4], 8, random.Random(0))
+    [0, 2, 2, 2, 2, 2, 2, 2]
+    >>> counts = [systematicResample([1, 0, 4], 8, random.Random(seed)).count(0)
+    ...           for seed in range(100)]
+    >>> sorted(set(counts))  # 8 / 5 = 1.6 expected
+    [1, 2]
+    """
+    cumulative = cumulativeWeights(weights)
+    step = cumulative[-1] / numSamples
+    offset = randomSource.random()
+    return selectAtPoints(cumulative, [(i + offset) * step for i in range(numSamples)])
+
+def stratifiedResample(weights, numSamples, randomSource=random):
+    """
+    Return numSamples indices into weights, chosen at one random point in
+    each of numSamples equal slices of the total weight.
+
+    >>> indices = stratifiedResample([1, 0, 4], 10000, random.Random(0))
+    >>> len(indices), indices.count(1), round(indices.count(2) / 10000.0, 1)
+    (10000, 0, 0.8)
+    >>> stratifiedResample([1, 0, 4], 8, random.Random(0))
+    [0, 2, 2, 2, 2, 2, 2, 2]
+    """
+    cumulative = cumulativeWeights(weights)
+    step = cumulative[-1] / numSamples
+    return selectAtPoints(cumulative, [(i + randomSource.random()) * step for i in range(numSamples)])
+
+def residualResample(weights, numSamples, randomSource=random):
+    """
+    Return numSamples indices into weights, taking each index the whole
+    number of times its share of numSamples allows and drawing the rest
+    multinomially from what is left over.
+
+    >>> residualResample([1, 1, 2], 8)  # nothing left over to draw
+    [0, 0, 1, 1, 2, 2, 2, 2]
+    >>> residualResample([1, 0, 4], 8, random.Random(0))
+    [0, 2, 2, 2, 2, 2, 2, 2]
+    """
+    total = float(sum(weights))
+    indices = []
+    residuals = []
+    for index, weight in enumerate(weights):
+        expected = numSamples * weight / total
+        copies = int(expected)
+        indices.extend([index] * copies)
+        residuals.append(expected - copies)
+    numLeft = numSamples - len(indices)
+    if numLeft > 0:
+        indices.extend(multinomialResample(residuals, numLeft, randomSource))
+    return indices
+
+RESAMPLING_SCHEMES = {
+    'multinomial': multinomialResample,
+    'systematic': systematicResample,
+    'stratified': stratifiedResample,
+    'residual': residualResample,
+}
+
+
 class InferenceModule:
     """
     An inference module tracks a belief distribution over a ghost's location.
@@ -194,6 +358,60 @@ class InferenceModule:
         # P(noisyDistance | trueDistance)
         return busters.getObservationProbability(noisyDistance, trueDistance)
 
+    def getPositionDistances(self, pacmanPosition):
+        """
+        Return the list of Manhattan distances from pacmanPosition to each of
+        self.legalPositions, computed once per Pacman position.
+        """
+        if pacmanPosition not in self.positionDistances:
+            self.positionDistances[pacmanPosition] = [manhattanDistance(pacmanPosition, ghostPosition)
+                                                      for ghostPosition in self.legalPositions]
+        return self.positionDistances[pacmanPosition]
+
+    def getObservationLikelihoods(self, noisyDistance, pacmanPosition):
+        """
+        Return the list of P(noisyDistance | pacmanPosition, ghostPosition) for
+        each ghostPosition in self.legalPositions, looked up in
+        busters.getObservationLikelihoods by the distances from Pacman.
+        """
+        if noisyDistance is None:
+            return [0] * len(self.legalPositions)
+        likelihoods = busters.getObservationLikelihoods(noisyDistance)
+        numDistances = len(likelihoods)
+        return [likelihoods[d] if d < numDistances else 0 for d in self.getPositionDistances(pacmanPosition)]
+
+    def getObservationLikelihoodDict(self, noisyDistance, pacmanPosition, jailPosition):
+        """
+        Return a dict from each legal position and jailPosition to
+        P(noisyDistance | pacmanPosition, ghostPosition), as getObservationProb
+        would give it.
+        """
+        likelihoods = dict(zip(self.legalPositions, self.getObservationLikelihoods(noisyDistance, pacmanPosition)))
+        likelihoods[jailPosition] = 1 if noisyDistance is None else 0
+        return likelihoods
+
+    def getPositionIndex(self, pos):
+        """
+        Return the index of pos in self.beliefPositions, adding it if pos has
+        not been seen before.
+        """
+        if pos not in self.positionIndices:
+            self.positionIndices[pos] = len(self.beliefPositions)
+            self.beliefPositions.append(pos)
+        return self.positionIndices[pos]
+
+    def getLikelihoodColumn(self, observation, pacmanPosition):
+        """
+        Return the list of P(observation | pacmanPosition, ghostPosition) for
+        each ghostPosition in self.allPositions.
+        """
+        key = (observation, pacmanPosition)
+        if key not in self.likelihoodColumns:
+            # self.allPositions is self.legalPositions followed by the jail
+            self.likelihoodColumns[key] = self.getObservationLikelihoods(observation, pacmanPosition) + \
+                                          [1 if observation is None else 0]
+        return self.likelihoodColumns[key]
+
     def setGhostPosition(self, gameState, ghostPosition, index):
         """
         Set the position of the ghost for this inference module to the specified
@@ -237,6 +455,10 @@ class InferenceModule:
         """
         self.legalPositions = [p for p in gameState.getWalls().asList(False) if p[1] > 1]
         self.allPositions = self.legalPositions + [self.getJailPosition()]
+        self.beliefPositions = list(self.allPositions)
+        self.positionIndices = dict((p, i) for i, p in enumerate(self.beliefPositions))
+        self.positionDistances = {}
+        self.likelihoodColumns = {}
         self.initializeUniformly(gameState)
 
     ######################################
@@ -273,16 +495,55 @@ class ExactInference(InferenceModule):
     """
     The exact dynamic inference module should use forward algorithm updates to
     compute the exact belief function at each time step.
+
+    The beliefs are kept in self.beliefVector, a list indexed like
+    self.beliefPositions.  A time step multiplies that
+    vector by a sparse transition matrix and an observation multiplies it
+    elementwise by a likelihood column.  Both are cached per Pacman position,
+    the transition matrices only for ghosts whose stationaryPolicy is set.
     """
     def initializeUniformly(self, gameState):
         """
         Begin with a uniform distribution over legal ghost positions (i.e., not
         including the jail position).
         """
-        self.beliefs = DiscreteDistribution()
-        for p in self.legalPositions:
-            self.beliefs[p] = 1.0
-        self.beliefs.normalize()
+        self.transitionMatrices = {}
+
+        # self.allPositions is self.legalPositions followed by the jail
+        self.setBeliefVector([1.0 / len(self.legalPositions)] * len(self.legalPositions) + [0.0])
+
+    def setBeliefVector(self, beliefVector):
+        self.beliefVector = beliefVector
+
+    def getTransitionRow(self, gameState, oldPos):
+        """
+        Return the (index, probability) pairs of the positions the ghost can
+        move to from oldPos.
+        """
+        newPosDist = self.getPositionDistribution(gameState, oldPos)
+        return [(self.getPositionIndex(newPos), newPosDist[newPos]) for newPos in newPosDist]
+
+    def getTransitionMatrix(self, gameState):
+        """
+        Return the transition model of the ghost from gameState as a sparse
+        matrix whose row i is the getTransitionRow of self.allPositions[i].
+
+        When the ghost agent's own class sets stationaryPolicy (see
+        GhostAgent; subclasses do not inherit it), its moves depend only
+        on its own position and Pacman's, so the matrix is kept per Pacman
+        position and a row is only filled in once the beliefs reach it; the
+        rows of positions with no belief may be None.
+        """
+        if not self.ghostAgent.__class__.__dict__.get('stationaryPolicy', False):
+            return [self.getTransitionRow(gameState, oldPos) for oldPos in self.allPositions]
+        pacmanPosition = gameState.getPacmanPosition()
+        if pacmanPosition not in self.transitionMatrices:
+            self.transitionMatrices[pacmanPosition] = [None] * len(self.allPositions)
+        matrix = self.transitionMatrices[pacmanPosition]
+        for oldIndex, oldPos in enumerate(self.allPositions):
+            if matrix[oldIndex] is None and self.beliefVector[oldIndex]:
+                matrix[oldIndex] = self.getTransitionRow(gameState, oldPos)
+        return matrix
 
     def observeUpdate(self, observation, gameState):
         """
@@ -299,21 +560,15 @@ class ExactInference(InferenceModule):
         current position. However, this is not a problem, as Pacman's current
         position is known.
         """
-        "*** YOUR CODE HERE ***"
-
         # Q2
-        pacmanPos = gameState.getPacmanPosition()
-        jailPos = self.getJailPosition()
-        ghostPoses = self.allPositions
-
-        for ghostPos in ghostPoses:
-            self.beliefs[ghostPos] *= self.getObservationProb(observation, pacmanPos, ghostPos, jailPos)
-
-        self.beliefs.normalize()
-
-
-
+        column = self.getLikelihoodColumn(observation, gameState.getPacmanPosition())
+        beliefVector = [belief * likelihood for belief, likelihood in zip(self.beliefVector, column)]
+        beliefVector.extend(self.beliefVector[len(column):])
 
+        total = float(sum(beliefVector))
+        if total != 0:
+            beliefVector = [belief / total for belief in beliefVector]
+        self.setBeliefVector(beliefVector)
 
     def elapseTime(self, gameState):
         """
@@ -324,35 +579,65 @@ class ExactInference(InferenceModule):
         Pacman's current position. However, this is not a problem, as Pacman's
         current position is known.
         """
-        "*** YOUR CODE HERE ***"
         # Q3
-        oldPoses = self.allPositions
-        newBeliefs = DiscreteDistribution()
-
-        for oldPos in oldPoses:
-            newPosDist = self.getPositionDistribution(gameState, oldPos)
-            for newPos in newPosDist:
-                newBeliefs[newPos] += self.beliefs[oldPos] * newPosDist[newPos]
-
-        self.beliefs = newBeliefs
-
-
+        matrix = self.getTransitionMatrix(gameState)
+        beliefVector = [0.0] * len(self.beliefPositions)
+        for oldIndex, row in enumerate(matrix):
+            belief = self.beliefVector[oldIndex]
+            if belief:
+                for newIndex, prob in row:
+                    beliefVector[newIndex] += belief * prob
+        self.setBeliefVector(beliefVector)
 
     def getBeliefDistribution(self):
-        return self.beliefs
+        """
+        Return the beliefs as a new DiscreteDistribution, so changing it does
+        not change the beliefs.
+        """
+        return DiscreteDistribution(zip(self.beliefPositions, self.beliefVector))
 
 
 class ParticleFilter(InferenceModule):
     """
     A particle filter for approximately tracking a single ghost.
+
+    Each particle is the index of its position in self.beliefPositions.
     """
-    def __init__(self, ghostAgent, numParticles=300):
+    def __init__(self, ghostAgent, numParticles=300, resampling='multinomial', randomSource=None):
         InferenceModule.__init__(self, ghostAgent);
         self.setNumParticles(numParticles)
+        self.setResampling(resampling, randomSource)
 
     def setNumParticles(self, numParticles):
         self.numParticles = numParticles
 
+    def setResampling(self, resampling, randomSource=None):
+        """
+        Choose how observeUpdate resamples the particles, by one of the names
+        in RESAMPLING_SCHEMES.  The draws come from randomSource, a
+        random.Random, or from the random module if it is None.
+
+        Every scheme keeps the number of particles and draws each index in
+        proportion to its weight:
+
+        >>> for name in sorted(RESAMPLING_SCHEMES):
+        ...     indices = RESAMPLING_SCHEMES[name]([1, 0, 4], 10000, random.Random(0))
+        ...     print name, len(indices), indices.count(1), round(indices.count(2) / 10000.0, 1)
+        multinomial 10000 0 0.8
+        residual 10000 0 0.8
+        stratified 10000 0 0.8
+        systematic 10000 0 0.8
+        """
+        self.resampling = RESAMPLING_SCHEMES[resampling]
+        self.randomSource = randomSource if randomSource is not None else random
+
+    def resample(self, weights):
+        """
+        Return self.numParticles indices into the list weights, drawn by the
+        chosen resampling scheme.
+        """
+        return self.resampling(weights, self.numParticles, self.randomSource)
+
     def initializeUniformly(self, gameState):
         """
         Initialize a list of particles. Use self.numParticles for the number of
@@ -361,14 +646,10 @@ class ParticleFilter(InferenceModule):
         distributed across positions in order to ensure a uniform prior. Use
         self.particles for the list of particles.
         """
-        self.particles = []
         # Q5
-        numPar = self.numParticles
-        legal = self.legalPositions
-        numLegal = len(legal)
-
-        for i in range(numPar):
-            self.particles.append(legal[i % numLegal])
+        # self.legalPositions come first in self.beliefPositions
+        numLegal = len(self.legalPositions)
+        self.particles = [i % numLegal for i in range(self.numParticles)]
 
     def observeUpdate(self, observation, gameState):
         """
@@ -382,55 +663,47 @@ class ParticleFilter(InferenceModule):
         be reinitialized by calling initializeUniformly. The total method of
         the DiscreteDistribution may be useful.
         """
-        "*** YOUR CODE HERE ***"
-
         # Q6
-        beliefs = DiscreteDistribution()
         pacmanPos = gameState.getPacmanPosition()
         jailPos = self.getJailPosition()
-        numPar = self.numParticles
+        positions = self.beliefPositions
 
-        seenParticles = {}
-        for particle in self.particles:
-            if particle in seenParticles:
-                p = seenParticles[particle]
-            else:
-                p = self.getObservationProb(observation, pacmanPos, particle, jailPos)
-                seenParticles[particle] = p
-            beliefs[particle] += p
+        column = self.getLikelihoodColumn(observation, pacmanPos)
+        if len(column) < len(positions):
+            column = column + [self.getObservationProb(observation, pacmanPos, pos, jailPos)
+                               for pos in positions[len(column):]]
 
-        if beliefs.total() == 0:
+        # The weights are summed by position, in the order a dict of the
+        # positions keeps them, so that multinomial resampling draws the same
+        # positions as calling sample on a DiscreteDistribution of the weights
+        weights = {}
+        for index in self.particles:
+            weights[positions[index]] = weights.get(positions[index], 0) + column[index]
+
+        if sum(weights.values()) == 0:
             # Reinitialize
             self.initializeUniformly(gameState)
-
         else:
             # Resample
-            self.particles = [beliefs.sample() for i in range(numPar)]
-
-        self.beliefs = beliefs
+            indices = [self.positionIndices[pos] for pos in weights.keys()]
+            self.particles = [indices[i] for i in self.resample(weights.values())]
 
     def elapseTime(self, gameState):
         """
         Sample each particle's next state based on its current state and the
         gameState.
         """
-        "*** YOUR CODE HERE ***"
         # Q7
-
-        # Faster implementation
         # Use a dict to store the seen particles, no need to calculate again
-
         seenParticles = {}
         for i in range(self.numParticles):
             particle = self.particles[i]
             if particle in seenParticles:
                 newPosDist = seenParticles[particle]
             else:
-                newPosDist = self.getPositionDistribution(gameState, particle)
+                newPosDist = self.getPositionDistribution(gameState, self.beliefPositions[particle])
                 seenParticles[particle] = newPosDist
-            self.particles[i] = newPosDist.sample()
-
-
+            self.particles[i] = self.getPositionIndex(newPosDist.sample())
 
     def getBeliefDistribution(self):
         """
@@ -438,11 +711,10 @@ class ParticleFilter(InferenceModule):
         locations conditioned on all evidence and time passage. This method
         essentially converts a list of particles into a belief distribution.
         """
-        "*** YOUR CODE HERE ***"
         # Q5
         beliefs = DiscreteDistribution()
         for particle in self.particles:
-            beliefs[particle] += 1
+            beliefs[self.beliefPositions[particle]] += 1
         beliefs.normalize()
         return beliefs
 
@@ -452,8 +724,9 @@ class JointParticleFilter(ParticleFilter):
     JointParticleFilter tracks a joint distribution over tuples of all ghost
     positions.
     """
-    def __init__(self, numParticles=600):
+    def __init__(self, numParticles=600, resampling='multinomial', randomSource=None):
         self.setNumParticles(numParticles)
+        self.setResampling(resampling, randomSource)
 
     def initialize(self, gameState, legalPositions):
         """
@@ -462,6 +735,7 @@ class JointParticleFilter(ParticleFilter):
         self.numGhosts = gameState.getNumAgents() - 1
         self.ghostAgents = []
         self.legalPositions = legalPositions
+        self.positionDistances = {}
         self.initializeUniformly(gameState)
 
     def initializeUniformly(self, gameState):
@@ -470,25 +744,31 @@ class JointParticleFilter(ParticleFilter):
         should be evenly distributed across positions in order to ensure a
         uniform prior.
         """
-        self.particles = []
         "*** YOUR CODE HERE ***"
         # Q8
-        numGhosts = self.numGhosts
-        numPar = self.numParticles
+        # Number the joint positions in base len(legal), one digit per ghost.
+        # Every joint position gets the same number of whole copies and the
+        # particles left over are distinct numbers drawn at random, which is
+        # the prior that wrapping around a shuffled list of all joint
+        # positions gives, without building that list.
         legal = self.legalPositions
         numLegal = len(legal)
+        numJoint = numLegal ** self.numGhosts
+        numCopies, numLeft = divmod(self.numParticles, numJoint)
 
-        # Cartesian product
-        permutations = list(itertools.product(legal, repeat = numGhosts))
-        random.shuffle(permutations)
-        numPer = len(permutations)
-
-        for i in range(numPar):
-            self.particles.append(permutations[i % numPer])
-
-
-
+        numbers = range(numJoint) * numCopies if numCopies else []
+        drawn = set()
+        while len(drawn) < numLeft:
+            drawn.add(self.randomSource.randrange(numJoint))
+        numbers.extend(drawn)
 
+        self.particles = []
+        for number in numbers:
+            particle = []
+            for i in range(self.numGhosts):
+                number, digit = divmod(number, numLegal)
+                particle.append(legal[digit])
+            self.particles.append(tuple(particle))
 
     def addGhostAgent(self, agent):
         """
@@ -523,27 +803,32 @@ class JointParticleFilter(ParticleFilter):
         "*** YOUR CODE HERE ***"
         # Q9
         pacmanPos =  gameState.getPacmanPosition()
-        beliefs = DiscreteDistribution()
-        particles = self.particles
         numGhosts = self.numGhosts
-        numPar = self.numParticles
 
-        seenPairs = {}
-        for particle in particles:
-            p = 1
+        # The observations of the ghosts are independent given their
+        # positions, so a particle's weight is the product of one likelihood
+        # per ghost, and it is worked out once for each distinct particle
+        counts = {}
+        for particle in self.particles:
+            counts[particle] = counts.get(particle, 0) + 1
+
+        likelihoods = [self.getObservationLikelihoodDict(observation[i], pacmanPos, self.getJailPosition(i))
+                       for i in range(numGhosts)]
+        beliefs = DiscreteDistribution()
+        for particle, count in counts.items():
+            p = count
             for i in range(numGhosts):
-                if (particle, i) in seenPairs:
-                    p *= seenPairs[(particle, i)]
-                else:
-                    mul = self.getObservationProb(observation[i], pacmanPos, particle[i], self.getJailPosition(i))
-                    p *= mul
-                    seenPairs[(particle, i)] = mul
-            beliefs[particle] += p
+                if particle[i] not in likelihoods[i]:
+                    likelihoods[i][particle[i]] = self.getObservationProb(observation[i], pacmanPos, particle[i],
+                                                                          self.getJailPosition(i))
+                p *= likelihoods[i][particle[i]]
+            beliefs[particle] = p
 
         if beliefs.total() == 0:
             self.initializeUniformly(gameState)
         else:
-            self.particles = [beliefs.sample() for i in range(numPar)]
+            particles = beliefs.keys()
+            self.particles = [particles[i] for i in self.resample(beliefs.values())]
 
         self.beliefs = beliefs
 
@@ -576,6 +861,13 @@ class JointParticleFilter(ParticleFilter):
             newParticles.append(tuple(newParticle))
         self.particles = newParticles
 
+    def getBeliefDistribution(self):
+        beliefs = DiscreteDistribution()
+        for particle in self.particles:
+            beliefs[particle] += 1
+        beliefs.normalize()
+        return beliefs
+
 
 # One JointInference module is shared globally across instances of MarginalInference
 jointInference = JointParticleFilter()